@@ -0,0 +1,240 @@
+"""Offline benchmark of the capture path against the synthetic site.
+
+Starts the local synthetic site (see synthetic_site.py), captures its
+pages with website_screenshot.py for every combination of --modes,
+--engines and --workers, and reports for each run:
+
+    URLs/min    URLs in the list divided by the wall-clock time of the run
+    stages      p50/p90 per stage, from the run's journal.jsonl
+    peak RSS    largest summed resident memory of website_screenshot.py and
+                all its child processes (ChromeDriver, Chrome), sampled
+                every SAMPLE_INTERVAL seconds; shared pages count once per
+                process, so compare it between runs rather than reading it
+                as absolute memory use
+
+    python benchmarks/run_benchmark.py --modes square,full --engines selenium,cdp --workers 1,4
+
+Arguments after -- are passed on to website_screenshot.py. By default every
+run uses --max-per-host 0 (all synthetic pages share one host), --retries 0
+and a fresh timing history, so runs don't depend on each other. The
+selenium engine needs a cached ChromeDriver (any earlier online run);
+the cdp engine needs none. Run folders are removed unless --keep is given.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_site import SyntheticSite, PAGE_TYPES
+from stage_timing import TimingReport
+from run_journal import iter_entries
+from website_screenshot import resolve_profiles, profiles_output_base
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MODES = ("square", "widescreen", "fourbythree", "full")
+SAMPLE_INTERVAL = 0.2
+REPORT_STAGES = ("launch", "navigation", "wait", "initial", "final", "write")
+
+def tree_rss(pid):
+    """Summed RSS in bytes of a process and its descendants, or None if it can't be measured."""
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    if not os.path.isdir("/proc"):
+        return None
+    # Without psutil, walk /proc (Linux)
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    children, rss = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * page_size
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total
+
+class PeakRSS:
+    """Samples tree_rss(pid) in a background thread until stopped."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        while not self.stopped.is_set():
+            rss = tree_rss(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self.stopped.wait(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.peak
+
+def run_folders(output_base):
+    folder = os.path.join(REPO_DIR, output_base)
+    return set(os.listdir(folder)) if os.path.isdir(folder) else set()
+
+def run_capture(mode, engine, workers, urls_file, work_dir, extra_args):
+    """Capture the URL list once and return the measurements."""
+    output_base = profiles_output_base(resolve_profiles(mode))
+    before = run_folders(output_base)
+    command = [sys.executable, os.path.join(REPO_DIR, "website_screenshot.py"), "-",
+               "--profiles", mode, "--engine", engine,
+               "--tabs" if engine == "cdp" else "--workers", str(workers),
+               "--max-per-host", "0", "--retries", "0",
+               "--timing-history", os.path.join(work_dir, f"timing_history_{mode}_{engine}_{workers}.json")]
+    command += extra_args
+    log_path = os.path.join(work_dir, f"{mode}_{engine}_{workers}.log")
+
+    # The URL list goes in on stdin ("-"), which also skips the "Press Enter" prompt
+    with open(urls_file, 'r', encoding='utf-8') as stdin, open(log_path, 'w', encoding='utf-8') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=REPO_DIR, stdin=stdin, stdout=log, stderr=subprocess.STDOUT)
+        sampler = PeakRSS(process.pid)
+        returncode = process.wait()
+        elapsed = time.perf_counter() - start
+        peak_rss = sampler.stop()
+
+    new_folders = sorted(run_folders(output_base) - before)
+    result = {"mode": mode, "engine": engine, "workers": workers, "seconds": round(elapsed, 2),
+              "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss else None, "log": log_path}
+    if returncode != 0 or not new_folders:
+        result["error"] = f"website_screenshot.py exited with {returncode}, see {log_path}"
+        return result, None
+
+    run_dir = os.path.join(REPO_DIR, output_base, new_folders[-1])
+    report = TimingReport()
+    ok = failed = 0
+    for entry in iter_entries(run_dir):
+        report.add(entry.get("timings"))
+        if entry.get("status") == "ok":
+            ok += 1
+        else:
+            failed += 1
+    result.update({
+        "urls": ok + failed,
+        "ok": ok,
+        "failed": failed,
+        "urls_per_min": round((ok + failed) / elapsed * 60, 1),
+        "stages": {stage: {f"p{pct}": round(seconds, 3) for pct, seconds in values.items()}
+                   for stage, values in report.percentiles().items()},
+    })
+    return result, run_dir
+
+def format_result(result):
+    label = f"{result['mode']:<12}{result['engine']:<9}{result['workers']:>3}"
+    if "error" in result:
+        return f"{label}  {result['error']}"
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] else "n/a"
+    stages = ", ".join(f"{stage} {values['p50']:.2f}/{values['p90']:.2f}s"
+                       for stage, values in result["stages"].items() if stage in REPORT_STAGES)
+    return (f"{label}  {result['urls_per_min']:>6.1f} URLs/min  {result['ok']:>3} ok {result['failed']:>3} failed  "
+            f"{result['seconds']:>7.1f}s  peak RSS {rss:>8}\n    p50/p90: {stages}")
+
+def parse_list(value, allowed=None, cast=str):
+    items = [cast(item.strip()) for item in value.split(",") if item.strip()]
+    if allowed:
+        unknown = [item for item in items if item not in allowed]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown value '{', '.join(unknown)}', use: {', '.join(allowed)}")
+    return items
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    extra_args = []
+    if "--" in argv:
+        extra_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    parser = argparse.ArgumentParser(description="Benchmark the capture path against a local synthetic site.")
+    parser.add_argument("--modes", default="square", type=lambda value: parse_list(value, MODES),
+                        help=f"comma-separated capture modes: {', '.join(MODES)} (default: square)")
+    parser.add_argument("--engines", default="selenium", type=lambda value: parse_list(value, ("selenium", "cdp")),
+                        help="comma-separated engines: selenium, cdp (default: selenium)")
+    parser.add_argument("--workers", default="1", type=lambda value: parse_list(value, cast=int),
+                        help="comma-separated worker counts (tabs for cdp) to compare (default: 1)")
+    parser.add_argument("--per-type", type=int, default=3,
+                        help=f"URLs of each page type ({', '.join(PAGE_TYPES)}) (default: 3)")
+    parser.add_argument("--pages", default=",".join(PAGE_TYPES), type=lambda value: parse_list(value, PAGE_TYPES),
+                        help="comma-separated page types to include (default: all)")
+    parser.add_argument("--output", metavar="FILE", help="also write the results as JSON to FILE")
+    parser.add_argument("--keep", action="store_true", help="keep the run folders with the screenshots")
+    args = parser.parse_args(argv)
+    args.extra_args = extra_args
+    return args
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix="screenshot_benchmark_")
+    results = []
+    try:
+        with SyntheticSite() as site:
+            urls = site.urls(args.per_type, args.pages)
+            urls_file = os.path.join(work_dir, "urls.txt")
+            with open(urls_file, 'w', encoding='utf-8') as f:
+                f.write("\n".join(urls) + "\n")
+            print(f"Synthetic site at {site.base_url}: {len(urls)} URLs ({', '.join(args.pages)})")
+            if not psutil:
+                print("psutil is not installed; peak RSS is read from /proc where available")
+
+            for mode in args.modes:
+                for engine in args.engines:
+                    for workers in args.workers:
+                        print(f"\nCapturing: {mode}, {engine}, {workers} {'tabs' if engine == 'cdp' else 'workers'}")
+                        result, run_dir = run_capture(mode, engine, workers, urls_file, work_dir, args.extra_args)
+                        results.append(result)
+                        print(format_result(result))
+                        if run_dir and not args.keep:
+                            shutil.rmtree(run_dir, ignore_errors=True)
+    finally:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults saved to: {args.output}")
+        if args.keep or any("error" in result for result in results):
+            print(f"Logs kept in: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\nSummary:")
+    for result in results:
+        print(format_result(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Local HTTP server with synthetic pages for the capture benchmark.
+
+Every page type stresses a different part of the capture path:
+
+    static      small page that is ready at once
+    slow        the response is delayed by SLOW_DELAY seconds
+    lazy        tall page of loading="lazy" images that are served slowly
+    infinite    appends content whenever the page is scrolled to the bottom
+    tall        30,000 px tall page (tiled full-page capture)
+    heavy-js    blocks the main thread on load and keeps changing the DOM
+    dead        the connection is closed without a response
+    refused     on a port nothing listens on (caught by the preflight)
+
+Run it on its own to look at the pages in a browser:
+    python benchmarks/synthetic_site.py --port 8000
+"""
+import io
+import time
+import socket
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from PIL import Image
+
+PAGE_TYPES = ("static", "slow", "lazy", "infinite", "tall", "heavy-js", "dead", "refused")
+SLOW_DELAY = 3.0
+IMAGE_DELAY = 0.2
+TALL_HEIGHT = 30000
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body {{ font-family: sans-serif; margin: 0; }} .block {{ height: 400px; margin: 20px;
+background: linear-gradient(#4a90d9, #c4e0ff); }}</style></head>
+<body><h1>{title}</h1>{body}</body></html>
+"""
+
+def page_body(page_type, number):
+    if page_type in ("static", "slow"):
+        return "<p>Synthetic page.</p>" + '<div class="block"></div>' * 3
+    if page_type == "lazy":
+        return "".join(f'<p>Image {i}</p><img src="/img/{number}-{i}.png" loading="lazy" width="800" height="400">'
+                       for i in range(40))
+    if page_type == "infinite":
+        return """<div id="feed"></div><script>
+var feed = document.getElementById('feed'), chunks = 0;
+function more() { for (var i = 0; i < 5; i++) { var d = document.createElement('div');
+    d.className = 'block'; d.textContent = 'Item ' + (chunks * 5 + i); feed.appendChild(d); } chunks++; }
+more(); more();
+window.addEventListener('scroll', function () {
+    if (chunks < 200 && window.innerHeight + window.scrollY >= document.body.scrollHeight - 100) { more(); } });
+</script>"""
+    if page_type == "tall":
+        return (f'<div style="height: {TALL_HEIGHT}px; background: repeating-linear-gradient('
+                '#fff 0, #fff 500px, #ddd 500px, #ddd 1000px)"></div>')
+    if page_type == "heavy-js":
+        return """<div id="ticker"></div><script>
+var end = Date.now() + 2000; while (Date.now() < end) { Math.sqrt(Math.random()); }
+var ticker = document.getElementById('ticker'), ticks = 0;
+setInterval(function () { ticker.textContent = 'Tick ' + (ticks++); }, 100);
+</script>""" + '<div class="block"></div>' * 3
+    return ""
+
+def make_png(width=800, height=400):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (90, 140, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class SyntheticSiteHandler(BaseHTTPRequestHandler):
+    png = make_png()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")
+        if segments[0] == "img":
+            time.sleep(IMAGE_DELAY)
+            self.send_body(self.png, "image/png")
+            return
+        page_type = segments[0]
+        if page_type not in PAGE_TYPES:
+            self.send_error(404)
+            return
+        if page_type == "dead":
+            self.close_connection = True
+            self.connection.close()
+            return
+        if page_type == "slow":
+            time.sleep(float(parse_qs(parts.query).get("delay", [SLOW_DELAY])[0]))
+        number = segments[1] if len(segments) > 1 else "0"
+        html = PAGE.format(title=f"{page_type} {number}", body=page_body(page_type, number))
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+class SyntheticSite:
+    """The server in a background thread; use as a context manager."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), SyntheticSiteHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="synthetic-site", daemon=True)
+        # A port that was free a moment ago, for the "refused" pages
+        with socket.socket() as probe:
+            probe.bind((host, 0))
+            self.closed_port = probe.getsockname()[1]
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, page_type, number):
+        if page_type == "refused":
+            return f"http://{self.server.server_address[0]}:{self.closed_port}/refused/{number}"
+        return f"{self.base_url}/{page_type}/{number}"
+
+    def urls(self, per_type=5, page_types=PAGE_TYPES):
+        """per_type URLs of every page type."""
+        return [self.url(page_type, number) for page_type in page_types for number in range(per_type)]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the synthetic benchmark pages.")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    with SyntheticSite(port=args.port) as site:
+        print("Pages:")
+        for url in site.urls(per_type=1):
+            print(f"  {url}")
+        print("Press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
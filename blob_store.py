@@ -0,0 +1,71 @@
+"""Content-addressed store for screenshot files, shared by all runs.
+
+Every file is stored once as <store>/<first 2 hex digits>/<sha256>.<ext>
+and the file in the run folder is a hard link to it, so identical images
+from recurring runs take disk space only once. Where hard links are not
+possible (e.g. the store is on another drive) the file is copied instead.
+
+Blobs no longer linked from any run folder can be removed with:
+    python blob_store.py prune <store>
+"""
+import os
+import sys
+import hashlib
+import threading
+
+class BlobStore:
+    """Hash-named file store; picklable, so it can be used in worker processes."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def put(self, data, ext):
+        """Store data (unless an identical blob exists) and return its path."""
+        path = self.blob_path(hashlib.sha256(data).hexdigest(), ext)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a temporary name so concurrent writers never see half a blob
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return path
+
+    def write(self, path, data):
+        """Make path a hard link to the blob holding data (a copy if linking fails)."""
+        blob = self.put(data, os.path.splitext(path)[1])
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.link(blob, path)
+        except OSError:
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def prune(self):
+        """Delete blobs that no run folder links to any more; returns (count, bytes)."""
+        count = size = 0
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                # The store's own entry is the only link left
+                if stat.st_nlink <= 1:
+                    os.remove(path)
+                    count += 1
+                    size += stat.st_size
+        return count, size
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != "prune":
+        print("Usage: python blob_store.py prune <store>")
+        sys.exit(1)
+    count, size = BlobStore(sys.argv[2]).prune()
+    print(f"Removed {count} unreferenced blobs ({size / 1024 / 1024:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Persistent HTTP disk cache for the capture browsers, kept across runs.
+
+Chrome normally starts with a throwaway profile, so shared CDN assets are
+downloaded again for every browser. With a cache folder every browser
+uses --disk-cache-dir inside it. Two Chrome processes must not share one
+cache directory, so each worker gets its own slot (slot-1, slot-2, ...)
+that it keeps for the run; later runs reuse the warm slots. Chrome keeps
+each slot under its share of the size limit (--disk-cache-size).
+
+Show the size of a cache folder or empty it with:
+    python browser_cache.py size <folder>
+    python browser_cache.py clear <folder>
+Do not use one cache folder for two runs at the same time.
+"""
+import os
+import sys
+import shutil
+import threading
+
+# Default total size of the cache folder
+DEFAULT_CACHE_SIZE_MB = 1024
+
+class BrowserCache:
+    """Hands out per-browser cache directories under one folder."""
+
+    def __init__(self, root, max_size_mb=DEFAULT_CACHE_SIZE_MB, slots=1):
+        self.root = os.path.abspath(root)
+        self.slots = max(1, slots)
+        self.slot_size = max_size_mb * 1024 * 1024 // self.slots
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Directory for the next browser; slots are reused round-robin."""
+        with self.lock:
+            self.next_slot = self.next_slot % self.slots + 1
+            slot = self.next_slot
+        path = os.path.join(self.root, f"slot-{slot}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def chrome_args(self, cache_dir):
+        """Chrome flags that put the HTTP cache in cache_dir."""
+        return [f"--disk-cache-dir={cache_dir}", f"--disk-cache-size={self.slot_size}"]
+
+def folder_size(path):
+    """Total size of the files under path, in bytes."""
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ("size", "clear"):
+        print("Usage: python browser_cache.py size|clear <folder>")
+        sys.exit(1)
+    command, root = sys.argv[1], sys.argv[2]
+    if not os.path.isdir(root):
+        print(f"Cache folder {root} does not exist.")
+        return
+    size_mb = folder_size(root) / 1024 / 1024
+    if command == "size":
+        print(f"{root}: {size_mb:.1f} MB")
+    else:
+        shutil.rmtree(root)
+        print(f"Removed {root} ({size_mb:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
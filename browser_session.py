@@ -0,0 +1,128 @@
+from urllib.parse import urlparse
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+class BrowserSession:
+    """Keep one Chrome driver alive across many URLs.
+
+    The driver is started lazily on the first acquire(), reset between URLs
+    and recycled after max_uses URLs or as soon as it stops responding.
+    on_start(driver), if given, is called for every newly started driver.
+    """
+
+    def __init__(self, chromedriver_path, options_factory, max_uses=50, page_load_timeout=60, on_start=None):
+        self.chromedriver_path = chromedriver_path
+        self.options_factory = options_factory
+        self.on_start = on_start
+        self.max_uses = max_uses
+        self.page_load_timeout = page_load_timeout
+        self.driver = None
+        self.uses = 0
+        self.launches = 0
+        self.window_size = None
+
+    def start(self):
+        """Launch a fresh Chrome driver."""
+        service = Service(executable_path=self.chromedriver_path)
+        self.driver = webdriver.Chrome(service=service, options=self.options_factory())
+        self.driver.set_page_load_timeout(self.page_load_timeout)
+        self.window_size = self.driver.get_window_size()
+        if self.on_start:
+            self.on_start(self.driver)
+        self.uses = 0
+        self.launches += 1
+        return self.driver
+
+    def acquire(self):
+        """Return a ready driver, starting or recycling Chrome when needed."""
+        if self.driver is not None and self.max_uses and self.uses >= self.max_uses:
+            print(f"Recycling browser after {self.uses} URLs")
+            self.quit()
+        if self.driver is None:
+            self.start()
+        self.uses += 1
+        return self.driver
+
+    def release(self, healthy=True):
+        """Reset the driver for the next URL, or drop it if it crashed."""
+        if self.driver is None:
+            return
+        if not healthy:
+            self.quit()
+            return
+        try:
+            self.reset()
+        except Exception as e:
+            print(f"Browser did not survive reset, restarting it: {e}")
+            self.quit()
+
+    def reset(self):
+        """Clear cookies, storage, extra windows and viewport size between URLs."""
+        driver = self.driver
+        # Collected first so the origins of popups are included
+        origins = self.visited_origins()
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        # Clear storage for every origin of the visit before leaving it
+        for origin in origins:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+        driver.get("about:blank")
+
+        if self.window_size and driver.get_window_size() != self.window_size:
+            driver.set_window_size(self.window_size['width'], self.window_size['height'])
+
+    def visited_origins(self):
+        """Origins that may have stored data during the visit.
+        
+        The current page, every entry of the tab's navigation history (pages
+        that redirected with script), all frames of the page and all other
+        targets (out-of-process iframes, workers). HTTP redirects run no
+        script, so they can only set cookies, which are cleared separately.
+        """
+        driver = self.driver
+        urls = [driver.current_url]
+        history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+        urls.extend(entry.get("url", "") for entry in history.get("entries", []))
+        frames = [driver.execute_cdp_cmd("Page.getFrameTree", {}).get("frameTree", {})]
+        while frames:
+            node = frames.pop()
+            urls.append(node.get("frame", {}).get("url", ""))
+            frames.extend(node.get("childFrames", []))
+        try:
+            targets = driver.execute_cdp_cmd("Target.getTargets", {}).get("targetInfos", [])
+            urls.extend(target.get("url", "") for target in targets)
+        except Exception:
+            pass
+        
+        origins = []
+        for url in urls:
+            parsed = urlparse(url)
+            if parsed.scheme in ('http', 'https'):
+                origin = f"{parsed.scheme}://{parsed.netloc}"
+                if origin not in origins:
+                    origins.append(origin)
+        return origins
+
+    def quit(self):
+        """Shut down the current driver, ignoring errors from a dead browser."""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except:
+                pass
+        self.driver = None
+        self.uses = 0
+
+    close = quit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.quit()
@@ -0,0 +1,127 @@
+import queue
+import threading
+import traceback
+from host_scheduler import HostScheduler, DONE
+
+class CaptureStats:
+    """Thread-safe success/failure counters shared by the capture workers."""
+
+    def __init__(self):
+        self.successful = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def add(self, success):
+        with self.lock:
+            if success:
+                self.successful += 1
+            else:
+                self.failed += 1
+
+    @property
+    def total(self):
+        return self.successful + self.failed
+
+def run_capture_pool(urls, capture_url, session_factory, workers=1, on_result=None, max_per_host=0):
+    """Capture every URL using a pool of workers, each with its own browser.
+
+    capture_url(url, session, record) must return True on success and may
+    add per-URL details to the record dict, which is then passed to
+    on_result(url, success, record). urls can be any iterable and is
+    consumed lazily. Returns a CaptureStats with the aggregated counters.
+
+    With max_per_host the URLs are handed out by a HostScheduler: at most
+    that many URLs of one domain are captured at once and each worker
+    stays on the same domain while it has work left. Otherwise URLs are
+    pulled in list order from a small bounded queue.
+    """
+    workers = max(1, workers)
+    stats = CaptureStats()
+    stop_marker = object()
+    errors = []
+
+    if max_per_host:
+        ready = threading.Condition()
+
+        def url_ready():
+            with ready:
+                ready.notify_all()
+
+        scheduler = HostScheduler(urls, max_per_host, on_ready=url_ready)
+
+        def next_url(worker_id):
+            with ready:
+                while True:
+                    try:
+                        url = scheduler.take(worker_id)
+                    except Exception as e:
+                        # Reading the URL list failed; stop this worker and re-raise after the others finish
+                        errors.append(e)
+                        return stop_marker
+                    if url is DONE:
+                        return stop_marker
+                    if url is not None:
+                        return url
+                    # Every waiting host is at its limit, or the next URL isn't read yet
+                    ready.wait()
+
+        def finished(url):
+            with ready:
+                scheduler.release(url)
+                ready.notify_all()
+    else:
+        url_queue = queue.Queue(maxsize=workers * 2)
+
+        def next_url(worker_id):
+            return url_queue.get()
+
+        def finished(url):
+            pass
+
+    def worker(worker_id):
+        with session_factory() as session:
+            while True:
+                url = next_url(worker_id)
+                if url is stop_marker:
+                    break
+                record = {}
+                try:
+                    success = capture_url(url, session, record)
+                except Exception as e:
+                    print(f"Unexpected error with {url}: {e}")
+                    print(traceback.format_exc())
+                    record["error"] = str(e)
+                    success = False
+                finally:
+                    finished(url)
+                stats.add(success)
+                if on_result:
+                    try:
+                        on_result(url, success, record)
+                    except Exception as e:
+                        print(f"Error recording result for {url}: {e}")
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"capture-{i + 1}", daemon=True)
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    if max_per_host:
+        for thread in threads:
+            thread.join()
+        scheduler.close()
+        if errors:
+            raise errors[0]
+        return stats
+
+    try:
+        for url in urls:
+            url_queue.put(url)
+    finally:
+        # One stop marker per worker so every thread exits after the queue drains
+        for _ in threads:
+            url_queue.put(stop_marker)
+        for thread in threads:
+            thread.join()
+
+    return stats
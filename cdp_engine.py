@@ -0,0 +1,635 @@
+"""Capture engine that drives Chrome over the DevTools Protocol with asyncio.
+
+Instead of one WebDriver round-trip per command and one browser per URL,
+a single Chrome process is started with remote debugging enabled and many
+tabs are driven concurrently over one websocket connection.
+"""
+import os
+import json
+import time
+import base64
+import shutil
+import asyncio
+import tempfile
+import subprocess
+import traceback
+import websockets
+from concurrent.futures import ThreadPoolExecutor
+from capture_pool import CaptureStats
+from page_ready import PageWait
+from website_screenshot import (sanitize_filename, ensure_protocol, resolve_profiles, screenshot_path,
+                                viewport_size, save_screenshot, MIN_FULL_PAGE_HEIGHT)
+from full_page import capture_full_page_async
+from stage_timing import StageTimer
+from image_pipeline import ImageWriter
+from host_scheduler import HostScheduler, DONE
+
+# Seconds a tab gets to close before Chrome counts as unresponsive
+TAB_CLOSE_TIMEOUT = 10
+# Request types left out of CDPTab.network_idle()
+LONG_LIVED_REQUESTS = ("EventSource", "WebSocket", "Media")
+# Seconds per viewport profile for the screenshots, on top of the page load and wait budgets
+CAPTURE_MARGIN = 30
+
+class CDPError(Exception):
+    """Error returned by Chrome for a DevTools command."""
+
+class CDPConnection:
+    """A websocket connection to the browser target with flattened sessions."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.next_id = 0
+        self.pending = {}
+        self.listeners = {}
+        self.callbacks = {}
+        self.reader = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, ws_url):
+        websocket = await websockets.connect(ws_url, max_size=None, ping_interval=None)
+        return cls(websocket)
+
+    @property
+    def closed(self):
+        return self.reader.done()
+
+    async def send(self, method, params=None, session_id=None):
+        """Send a command and wait for its result."""
+        if self.closed:
+            raise CDPError("Browser connection closed")
+        self.next_id += 1
+        message_id = self.next_id
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        try:
+            await self.websocket.send(json.dumps(message))
+        except websockets.ConnectionClosed as e:
+            self.pending.pop(message_id, None)
+            if future.done():
+                # Already failed by _read_loop; mark its error as seen
+                future.exception()
+            raise CDPError(f"Browser connection closed ({e})")
+        return await future
+
+    def listen(self, session_id, method):
+        """Return a queue that receives every `method` event for a session."""
+        events = asyncio.Queue()
+        self.listeners.setdefault((session_id, method), []).append(events)
+        return events
+
+    def subscribe(self, session_id, method, callback):
+        """Call callback(params) from the read loop for every `method` event of a session."""
+        self.callbacks.setdefault((session_id, method), []).append(callback)
+
+    async def next_event(self, events):
+        """Next event from a listen() queue, or CDPError once the connection is closed."""
+        getter = asyncio.ensure_future(events.get())
+        try:
+            await asyncio.wait({getter, self.reader}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not getter.done():
+                getter.cancel()
+        if not getter.done() or getter.cancelled():
+            raise CDPError("Browser connection closed")
+        return getter.result()
+
+    def unlisten(self, session_id):
+        for key in [key for key in self.listeners if key[0] == session_id]:
+            del self.listeners[key]
+        for key in [key for key in self.callbacks if key[0] == session_id]:
+            del self.callbacks[key]
+
+    async def _read_loop(self):
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self.pending.pop(message["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                    else:
+                        future.set_result(message.get("result", {}))
+                else:
+                    key = (message.get("sessionId"), message.get("method"))
+                    for events in self.listeners.get(key, []):
+                        events.put_nowait(message.get("params", {}))
+                    for callback in self.callbacks.get(key, []):
+                        callback(message.get("params", {}))
+        except Exception as e:
+            error = CDPError(f"Browser connection closed ({e})")
+        else:
+            error = CDPError("Browser connection closed")
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def close(self):
+        await self.websocket.close()
+        self.reader.cancel()
+
+class CDPBrowser:
+    """A headless Chrome process controlled over the DevTools Protocol."""
+
+    def __init__(self, chrome_path, chrome_args=(), page_load_timeout=60):
+        self.chrome_path = chrome_path
+        self.chrome_args = list(chrome_args)
+        self.page_load_timeout = page_load_timeout
+        self.process = None
+        self.profile_dir = None
+        self.connection = None
+        self.unresponsive = False
+
+    @property
+    def alive(self):
+        """False once Chrome has exited, dropped the connection or stopped answering."""
+        return (self.connection is not None and not self.connection.closed and not self.unresponsive
+                and self.process is not None and self.process.poll() is None)
+
+    async def start(self):
+        """Launch Chrome and connect to its browser websocket."""
+        self.profile_dir = tempfile.mkdtemp(prefix="cdp-profile-")
+        args = [self.chrome_path] + self.chrome_args + [
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "about:blank",
+        ]
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome writes the chosen port and browser path once it is listening
+        port_file = os.path.join(self.profile_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + 30
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    break
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                raise CDPError("Chrome did not start with remote debugging enabled")
+            await asyncio.sleep(0.1)
+
+        ws_url = f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+        self.connection = await CDPConnection.connect(ws_url)
+        return self
+
+    async def new_tab(self):
+        """Open a new tab and attach a flattened session to it."""
+        target = await self.connection.send("Target.createTarget", {"url": "about:blank"})
+        attached = await self.connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        tab = CDPTab(self, target["targetId"], attached["sessionId"])
+        await tab.send("Page.enable")
+        await tab.send("Page.setLifecycleEventsEnabled", {"enabled": True})
+        await tab.track_requests()
+        return tab
+
+    async def close(self):
+        """Close the browser and remove its temporary profile."""
+        if self.connection is not None:
+            try:
+                await asyncio.wait_for(self.connection.send("Browser.close"), 5)
+            except Exception:
+                pass
+            try:
+                await self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+        if self.process is not None:
+            # Poll instead of wait() so the other tabs keep running meanwhile
+            deadline = time.monotonic() + 10
+            while self.process.poll() is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+class CDPTab:
+    """One browser tab with its own DevTools session."""
+
+    def __init__(self, browser, target_id, session_id):
+        self.browser = browser
+        self.target_id = target_id
+        self.session_id = session_id
+        self.requests = set()
+        self.network_changed = time.monotonic()
+        self.failing = set()
+
+    async def track_requests(self):
+        """Keep count of this tab's requests in flight for network_idle()."""
+        connection = self.browser.connection
+        connection.subscribe(self.session_id, "Network.requestWillBeSent", self._request_started)
+        connection.subscribe(self.session_id, "Network.loadingFinished", self._request_done)
+        connection.subscribe(self.session_id, "Network.loadingFailed", self._request_done)
+        await self.send("Network.enable")
+
+    def _request_started(self, params):
+        # Streams never finish loading and would keep the page from ever being idle
+        if params.get("type") not in LONG_LIVED_REQUESTS:
+            self.requests.add(params.get("requestId"))
+            self.network_changed = time.monotonic()
+
+    def _request_done(self, params):
+        if params.get("requestId") in self.requests:
+            self.requests.discard(params.get("requestId"))
+            self.network_changed = time.monotonic()
+
+    async def fail_requests(self, resource_types):
+        """Fail every request of these Network.ResourceTypes as blocked by the client.
+
+        Fetch only pauses the requests that match its patterns; the others
+        load without waiting for us.
+        """
+        self.browser.connection.subscribe(self.session_id, "Fetch.requestPaused", self._request_paused)
+        await self.send("Fetch.enable", {"patterns": [{"resourceType": resource_type, "requestStage": "Request"}
+                                                      for resource_type in resource_types]})
+
+    def _request_paused(self, params):
+        # Keep a reference so the task isn't garbage collected while it runs
+        task = asyncio.ensure_future(self._fail_request(params["requestId"]))
+        self.failing.add(task)
+        task.add_done_callback(self.failing.discard)
+
+    async def _fail_request(self, request_id):
+        try:
+            await self.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "BlockedByClient"})
+        except CDPError:
+            # The tab was closed meanwhile
+            pass
+
+    def network_idle(self, idle_seconds):
+        """True when no request has been in flight for idle_seconds."""
+        return not self.requests and time.monotonic() - self.network_changed >= idle_seconds
+
+    async def send(self, method, params=None):
+        return await self.browser.connection.send(method, params, self.session_id)
+
+    async def navigate(self, url, timeout=None):
+        """Navigate and wait for the load event, like driver.get().
+        
+        timeout defaults to the browser's page_load_timeout.
+        """
+        lifecycle = self.browser.connection.listen(self.session_id, "Page.lifecycleEvent")
+        result = await self.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise CDPError(f"{result['errorText']} at {url}")
+
+        async def wait_for_load():
+            while True:
+                event = await self.browser.connection.next_event(lifecycle)
+                if (event.get("name") == "load" and event.get("frameId") == result.get("frameId")
+                        and event.get("loaderId") == result.get("loaderId")):
+                    return
+
+        await asyncio.wait_for(wait_for_load(), timeout or self.browser.page_load_timeout)
+
+    async def evaluate(self, expression):
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True, "awaitPromise": True})
+        return result.get("result", {}).get("value")
+
+    async def set_viewport(self, width, height):
+        await self.send("Emulation.setDeviceMetricsOverride",
+                        {"width": width, "height": height, "deviceScaleFactor": 1, "mobile": False})
+
+    async def capture_profile(self, profile):
+        """Resize the viewport for a viewport profile and return a screenshot as PNG bytes."""
+        width, height = viewport_size(profile)
+        if profile["height"] is None:
+            png, height = await capture_full_page_async(self.send, self.evaluate, width,
+                                                        MIN_FULL_PAGE_HEIGHT, profile["max_pixels"])
+            print(f"Page dimensions: {width}x{height}")
+            return png
+        await self.set_viewport(width, height)
+        return await self.screenshot()
+
+    async def screenshot(self):
+        """Capture the viewport and return it as PNG bytes."""
+        result = await self.send("Page.captureScreenshot", {"format": "png"})
+        return base64.b64decode(result["data"])
+
+    async def close(self):
+        self.browser.connection.unlisten(self.session_id)
+        try:
+            await asyncio.wait_for(self.browser.connection.send("Target.closeTarget", {"targetId": self.target_id}),
+                                   TAB_CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Chrome itself no longer answers; the session replaces it
+            self.browser.unresponsive = True
+        except Exception:
+            pass
+
+class CDPBrowserSession:
+    """Hands out a running CDPBrowser to the tab workers, like BrowserSession for selenium.
+
+    Chrome is started by start(), replaced as soon as it dies or stops
+    answering and recycled after max_uses tabs (0 keeps it for the whole
+    run). A replaced browser is closed once its last tab is done. With a
+    BrowserCache every Chrome gets a cache slot that no other running
+    Chrome uses, as a replaced one may still be finishing its tabs.
+    """
+
+    def __init__(self, chrome_path, chrome_args=(), page_load_timeout=60, max_uses=50, browser_cache=None):
+        self.chrome_path = chrome_path
+        self.chrome_args = list(chrome_args)
+        self.page_load_timeout = page_load_timeout
+        self.max_uses = max_uses
+        self.browser_cache = browser_cache
+        self.browser = None
+        self.uses = 0
+        self.active = {}  # browser -> tabs in use
+        self.cache_dirs = {}  # browser -> its cache slot
+        self.lock = asyncio.Lock()
+
+    async def _free_cache_dir(self):
+        while True:
+            in_use = set(self.cache_dirs.values())
+            for _ in range(self.browser_cache.slots):
+                cache_dir = self.browser_cache.acquire()
+                if cache_dir not in in_use:
+                    return cache_dir
+            # Every slot belongs to a replaced browser that is still finishing its tabs
+            await asyncio.sleep(0.1)
+
+    async def start(self):
+        chrome_args, cache_dir = self.chrome_args, None
+        if self.browser_cache:
+            cache_dir = await self._free_cache_dir()
+            chrome_args = chrome_args + self.browser_cache.chrome_args(cache_dir)
+        browser = CDPBrowser(self.chrome_path, chrome_args, self.page_load_timeout)
+        try:
+            await browser.start()
+        except Exception:
+            # Don't leave a half-started Chrome or its profile behind
+            await browser.close()
+            raise
+        if cache_dir:
+            self.cache_dirs[browser] = cache_dir
+        self.browser = browser
+        self.uses = 0
+        return browser
+
+    async def acquire(self):
+        """Return a running browser for the next tab."""
+        async with self.lock:
+            if self.browser is not None and not self.browser.alive:
+                print("Browser connection lost, restarting Chrome")
+                await self._retire()
+            elif self.browser is not None and self.max_uses and self.uses >= self.max_uses:
+                print(f"Recycling browser after {self.uses} URLs")
+                await self._retire()
+            if self.browser is None:
+                await self.start()
+            self.uses += 1
+            self.active[self.browser] = self.active.get(self.browser, 0) + 1
+            return self.browser
+
+    async def release(self, browser):
+        """Give back a browser after its tab is closed."""
+        self.active[browser] -= 1
+        if not self.active[browser]:
+            del self.active[browser]
+            if browser is not self.browser:
+                await self._close(browser)
+
+    async def _retire(self):
+        browser, self.browser = self.browser, None
+        if browser not in self.active:
+            await self._close(browser)
+
+    async def _close(self, browser):
+        await browser.close()
+        self.cache_dirs.pop(browser, None)
+
+    async def close(self):
+        browsers = set(self.active)
+        if self.browser is not None:
+            browsers.add(self.browser)
+        self.browser = None
+        self.active.clear()
+        for browser in browsers:
+            await self._close(browser)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+async def capture_url(browser, url, output_dir, wait, profiles, record, writer, blocker=None, history=None):
+    """Take the initial and final screenshots of one URL in a new tab.
+
+    Mirrors take_screenshot(): every viewport profile is captured from one
+    page load, with the same file names, messages and record details, and
+    True is returned when at least one initial screenshot was saved. The
+    whole capture gets the page load timeout plus the wait budget plus
+    CAPTURE_MARGIN per profile, so a renderer that stops answering fails
+    this URL instead of holding its tab forever.
+    """
+    sanitized_url = sanitize_filename(url)
+    full_url = ensure_protocol(url)
+    success = False
+    record["files"] = []
+    timer = StageTimer(record)
+    page_load_timeout, max_wait = browser.page_load_timeout, None
+    if history:
+        page_load_timeout, max_wait = history.budgets(url)
+        record["budgets"] = {"page_load": page_load_timeout, "wait": max_wait}
+    capture_timeout = page_load_timeout + wait.budget(max_wait) + CAPTURE_MARGIN * len(profiles)
+
+    print(f"Processing: {url}")
+
+    # Hashing and encoding run in threads so the other tabs keep going meanwhile
+    loop = asyncio.get_running_loop()
+    tab = None
+
+    async def load_and_capture():
+        nonlocal tab, success
+        with timer.stage("launch"):
+            tab = await browser.new_tab()
+            if blocker:
+                failed_requests = browser.connection.listen(tab.session_id, "Network.loadingFailed")
+                await blocker.apply_async(tab)
+        try:
+            with timer.stage("navigation"):
+                await tab.set_viewport(*viewport_size(profiles[0]))
+                await tab.navigate(full_url, page_load_timeout)
+
+            # Take initial screenshots immediately
+            initial_shots = {}
+            for profile in profiles:
+                initial_output_path = screenshot_path(output_dir, sanitized_url, "initial", profile)
+                with timer.stage("initial"):
+                    png = await tab.capture_profile(profile)
+                initial_hash = await loop.run_in_executor(None, save_screenshot, writer, record, timer,
+                                                          initial_output_path, png)
+                initial_shots[profile["name"]] = (initial_output_path, initial_hash)
+                success = True
+
+            try:
+                # Wait for the page to settle at the first profile's size, scrolling
+                # down and up so lazy-loaded elements load
+                with timer.stage("wait"):
+                    await tab.set_viewport(*viewport_size(profiles[0]))
+                    await wait.settle_async(tab, max_wait)
+
+                for profile in profiles:
+                    final_output_path = screenshot_path(output_dir, sanitized_url, "final", profile)
+                    with timer.stage("final"):
+                        png = await tab.capture_profile(profile)
+                    await loop.run_in_executor(None, save_screenshot, writer, record, timer, final_output_path, png,
+                                               initial_shots[profile["name"]])
+            except Exception as final_error:
+                # Keep the partial success from the initial screenshot
+                print(f"Error taking final screenshot: {final_error}")
+                record["error"] = f"final screenshot: {final_error}"
+
+            if blocker:
+                record["blocked"] = await blocker.blocked_async(tab, failed_requests)
+                print(f"Blocked requests: {record['blocked']['requests']}")
+        except asyncio.TimeoutError:
+            print(f"Timeout while loading {url}")
+            record["error"] = f"Timed out after {page_load_timeout}s"
+        except CDPError as nav_error:
+            print(f"Error navigating to URL: {nav_error}")
+            record["error"] = str(nav_error)
+
+    try:
+        await asyncio.wait_for(load_and_capture(), capture_timeout)
+    except asyncio.TimeoutError:
+        print(f"Capture of {url} timed out after {capture_timeout}s")
+        record["error"] = f"Capture timed out after {capture_timeout}s"
+    except CDPError as e:
+        # The browser went away while opening the tab
+        print(f"Error with {url}: {e}")
+        record["error"] = str(e)
+    except Exception as e:
+        print(f"Unexpected error with {url}: {e}")
+        print(traceback.format_exc())
+        record["error"] = str(e)
+    finally:
+        if tab is not None:
+            await tab.close()
+
+    return success
+
+async def capture_urls(urls, output_dir, chrome_path, chrome_args=(), tabs=8, page_load_timeout=60, wait=None, profiles=None,
+                       on_result=None, writer=None, blocker=None, max_per_host=0, history=None, recycle_after=50,
+                       browser_cache=None):
+    """Capture every URL with up to `tabs` tabs in flight in one Chrome.
+
+    Chrome is restarted when it dies or stops answering, and replaced
+    after recycle_after URLs (0 keeps it for the whole run); the URLs it
+    was loading fail with a transient error, so they are retried. With a
+    BrowserCache each Chrome keeps its HTTP cache in one of its slots.
+    on_result(url, success, record) is called as each URL finishes. With
+    max_per_host no more than that many tabs load URLs of the same domain
+    at once (see HostScheduler). With a TimingHistory each URL gets its
+    own page load timeout and wait budget.
+    """
+    if wait is None:
+        wait = PageWait()
+    if profiles is None:
+        profiles = resolve_profiles("square")
+    if writer is None:
+        writer = ImageWriter()
+    stats = CaptureStats()
+    stop_marker = object()
+
+    if max_per_host:
+        # The scheduler reads the URL list in its own thread, never on the event loop
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        scheduler = HostScheduler(urls, max_per_host, on_ready=lambda: loop.call_soon_threadsafe(ready.set))
+
+        async def next_url(worker_id):
+            while True:
+                ready.clear()
+                url = scheduler.take(worker_id)
+                if url is DONE:
+                    return stop_marker
+                if url is not None:
+                    return url
+                # Every waiting host is at its limit, or the next URL isn't read yet
+                await ready.wait()
+
+        async def finished(url):
+            scheduler.release(url)
+            ready.set()
+    else:
+        # One thread reads the list in order, so a slow input never blocks the event loop
+        loop = asyncio.get_running_loop()
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="url-reader")
+        url_iterator = iter(urls)
+
+        async def next_url(worker_id):
+            return await loop.run_in_executor(reader, next, url_iterator, stop_marker)
+
+        async def finished(url):
+            pass
+
+    async with CDPBrowserSession(chrome_path, chrome_args, page_load_timeout, recycle_after,
+                                 browser_cache) as session:
+        async def worker(worker_id):
+            while True:
+                url = await next_url(worker_id)
+                if url is stop_marker:
+                    break
+                record = {}
+                success = False
+                try:
+                    try:
+                        browser = await session.acquire()
+                    except Exception as e:
+                        # Fails this URL only; the next one tries to start Chrome again
+                        print(f"Could not start Chrome for {url}: {e}")
+                        record["error"] = f"Browser could not be started: {e}"
+                    else:
+                        try:
+                            success = await capture_url(browser, url, output_dir, wait, profiles, record, writer,
+                                                        blocker, history)
+                        finally:
+                            await session.release(browser)
+                finally:
+                    await finished(url)
+                stats.add(success)
+                if on_result:
+                    try:
+                        on_result(url, success, record)
+                    except Exception as e:
+                        print(f"Error recording result for {url}: {e}")
+
+        workers = [asyncio.ensure_future(worker(i)) for i in range(max(1, tabs))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            if max_per_host:
+                scheduler.close()
+            else:
+                reader.shutdown(wait=False)
+
+    return stats
+
+def run_cdp_capture(urls, output_dir, chrome_path, chrome_args=(), tabs=8, page_load_timeout=60, wait=None, profiles=None,
+                    on_result=None, writer=None, blocker=None, max_per_host=0, history=None, recycle_after=50,
+                    browser_cache=None):
+    """Synchronous entry point used by process_websites."""
+    return asyncio.run(capture_urls(urls, output_dir, chrome_path, chrome_args, tabs, page_load_timeout, wait, profiles,
+                                    on_result, writer, blocker, max_per_host, history, recycle_after, browser_cache))
@@ -0,0 +1,91 @@
+"""On-disk ChromeDriver cache keyed by Chrome major version and platform.
+
+Drivers live in drivers/<platform>/<major>/ next to an index (cache.json)
+that records the exact driver version and the SHA-256 of the executable,
+so a cached driver is only used if it is still intact.
+"""
+import os
+import json
+import shutil
+import hashlib
+import platform
+
+def get_platform_name():
+    """Chrome for Testing platform name for this machine."""
+    if platform.system() == 'Windows':
+        return "win64"
+    elif platform.system() == 'Linux':
+        return "linux64"
+    elif platform.system() == 'Darwin':
+        if platform.machine() == 'arm64':  # M1/M2 Mac
+            return "mac-arm64"
+        return "mac-x64"
+    return None
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DriverCache:
+    """Versioned ChromeDriver store under a drivers directory."""
+
+    def __init__(self, driver_dir):
+        self.driver_dir = driver_dir
+        self.index_path = os.path.join(driver_dir, "cache.json")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        os.makedirs(self.driver_dir, exist_ok=True)
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def key(major_version, platform_name):
+        return f"{platform_name}/{major_version}"
+
+    def lookup(self, major_version, platform_name):
+        """Return the cached driver path if present and intact, else None."""
+        entry = self._load_index().get(self.key(major_version, platform_name))
+        if not entry:
+            return None
+        path = os.path.join(self.driver_dir, entry["path"])
+        if not os.path.exists(path):
+            return None
+        if file_sha256(path) != entry.get("sha256"):
+            print(f"Cached ChromeDriver at {path} failed its integrity check, downloading it again")
+            return None
+        return path
+
+    def store(self, major_version, platform_name, driver_version, executable):
+        """Copy a freshly extracted driver into the cache and return its path."""
+        relative_dir = os.path.join(platform_name, str(major_version))
+        target_dir = os.path.join(self.driver_dir, relative_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, os.path.basename(executable))
+
+        # Copy under a temporary name first so a crash never leaves a half-written driver
+        temp_path = target_path + ".tmp"
+        shutil.copy(executable, temp_path)
+        if platform.system() != 'Windows':
+            os.chmod(temp_path, 0o755)
+        os.replace(temp_path, target_path)
+
+        index = self._load_index()
+        index[self.key(major_version, platform_name)] = {
+            "version": driver_version,
+            "path": os.path.join(relative_dir, os.path.basename(executable)),
+            "sha256": file_sha256(target_path),
+        }
+        self._save_index(index)
+        return target_path
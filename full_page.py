@@ -0,0 +1,97 @@
+"""Full-page screenshots through the DevTools Protocol with bounded memory.
+
+The page is measured at the profile's width, set with a viewport override
+so the browser window is never resized. Pages that fit in the pixel budget
+are captured in one Page.captureScreenshot call with captureBeyondViewport
+and a clip. Taller pages are captured as a series of viewport-sized tiles
+(the page is scrolled between tiles) and stitched together, so Chrome only
+ever renders one tile at a time.
+"""
+import io
+import base64
+import asyncio
+from PIL import Image
+
+# Largest capture done in one piece (about 1920 x 8300 px)
+DEFAULT_MAX_PIXELS = 16000000
+
+# Tallest viewport used when capturing in tiles
+MAX_TILE_HEIGHT = 4096
+
+def content_height(layout_metrics):
+    """Document height in CSS pixels from a Page.getLayoutMetrics result."""
+    size = layout_metrics.get("cssContentSize") or layout_metrics.get("contentSize") or {}
+    return int(size.get("height", 0))
+
+def tile_height_for(width, max_pixels):
+    return max(1, min(MAX_TILE_HEIGHT, max_pixels // width))
+
+def screenshot_params(width, height):
+    return {"format": "png", "captureBeyondViewport": True,
+            "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": 1}}
+
+def viewport_params(width, height):
+    return {"width": width, "height": height, "deviceScaleFactor": 1, "mobile": False}
+
+def stitch_tiles(tiles, width, height):
+    """Paste (scroll_y, png_bytes) tiles onto one image and return it as PNG bytes.
+
+    Tiles may overlap (the last scroll position is clamped by the browser),
+    later tiles simply overwrite the overlapping rows.
+    """
+    canvas = Image.new("RGB", (width, height), "white")
+    for y, png in tiles:
+        with Image.open(io.BytesIO(png)) as tile:
+            canvas.paste(tile.convert("RGB"), (0, int(y)))
+    output = io.BytesIO()
+    canvas.save(output, format="PNG")
+    canvas.close()
+    return output.getvalue()
+
+def capture_full_page(send, evaluate, width, min_height, max_pixels=DEFAULT_MAX_PIXELS):
+    """Capture the whole page and return (png_bytes, height).
+
+    send(method, params) runs a DevTools command and evaluate(expression)
+    returns the value of a JavaScript expression, e.g. driver.execute_cdp_cmd
+    and a wrapper around driver.execute_script.
+    """
+    # Measured at the profile's width, not whatever the previous profile left
+    send("Emulation.setDeviceMetricsOverride", viewport_params(width, min_height))
+    height = max(content_height(send("Page.getLayoutMetrics", {})), min_height)
+    if width * height <= max_pixels:
+        result = send("Page.captureScreenshot", screenshot_params(width, height))
+        return base64.b64decode(result["data"]), height
+
+    tile_height = tile_height_for(width, max_pixels)
+    print(f"Page is {width}x{height}, capturing in {tile_height}px tiles")
+    send("Emulation.setDeviceMetricsOverride", viewport_params(width, tile_height))
+    # Layouts sized by the viewport (100vh sections...) change height with it
+    height = max(content_height(send("Page.getLayoutMetrics", {})), min_height)
+    tiles = []
+    for y in range(0, height, tile_height):
+        scroll_y = evaluate(f"(window.scrollTo(0, {y}), window.scrollY)")
+        result = send("Page.captureScreenshot", {"format": "png"})
+        tiles.append((scroll_y or 0, base64.b64decode(result["data"])))
+    evaluate("window.scrollTo(0, 0)")
+    return stitch_tiles(tiles, width, height), height
+
+async def capture_full_page_async(send, evaluate, width, min_height, max_pixels=DEFAULT_MAX_PIXELS):
+    """capture_full_page() for coroutine send/evaluate (cdp_engine tabs)."""
+    await send("Emulation.setDeviceMetricsOverride", viewport_params(width, min_height))
+    height = max(content_height(await send("Page.getLayoutMetrics", {})), min_height)
+    if width * height <= max_pixels:
+        result = await send("Page.captureScreenshot", screenshot_params(width, height))
+        return base64.b64decode(result["data"]), height
+
+    tile_height = tile_height_for(width, max_pixels)
+    print(f"Page is {width}x{height}, capturing in {tile_height}px tiles")
+    await send("Emulation.setDeviceMetricsOverride", viewport_params(width, tile_height))
+    height = max(content_height(await send("Page.getLayoutMetrics", {})), min_height)
+    tiles = []
+    for y in range(0, height, tile_height):
+        scroll_y = await evaluate(f"(window.scrollTo(0, {y}), window.scrollY)")
+        result = await send("Page.captureScreenshot", {"format": "png"})
+        tiles.append((scroll_y or 0, base64.b64decode(result["data"])))
+    await evaluate("window.scrollTo(0, 0)")
+    png = await asyncio.get_running_loop().run_in_executor(None, stitch_tiles, tiles, width, height)
+    return png, height
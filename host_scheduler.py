@@ -0,0 +1,147 @@
+"""Host-aware ordering of URLs for the capture workers.
+
+URLs are grouped by registrable domain (example.co.uk for
+www.shop.example.co.uk). At most max_per_host URLs of one domain are
+captured at the same time, different domains are interleaved, and a
+worker keeps getting URLs of the domain it just captured while that
+domain has work left, so its browser's DNS, TLS and HTTP cache stay warm.
+
+The (possibly streamed) list is read by a feeder thread, so a slow input
+never holds up the workers, and at most twice `lookahead` URLs are read
+ahead of the captures, so memory use stays bounded.
+"""
+import queue
+import threading
+import ipaddress
+from collections import OrderedDict, deque, Counter
+from urllib.parse import urlsplit
+
+DEFAULT_LOOKAHEAD = 1000
+DEFAULT_MAX_PER_HOST = 2
+
+# Second-level labels under which names are registered in country domains (co.uk, com.au, ...)
+SECOND_LEVEL_LABELS = {"co", "com", "net", "org", "gov", "edu", "ac", "or", "ne", "go", "gob", "nic"}
+
+# Returned by HostScheduler.take() when every URL has been handed out
+DONE = object()
+# Put by the feeder thread after the last URL
+FEED_END = object()
+
+def host_key(url):
+    """Registrable domain of a URL (approximate, without a public suffix list)."""
+    try:
+        host = urlsplit(url if "://" in url else "https://" + url).hostname or url
+    except ValueError:
+        return url
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.rstrip(".").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+class HostScheduler:
+    """Decides which URL each worker captures next.
+
+    take() and release() are not thread-safe by themselves:
+    run_capture_pool guards them with a threading.Condition and cdp_engine
+    runs them on its event loop. on_ready() is called from the feeder
+    thread whenever it has read another URL, so waiting workers can try
+    take() again. Call close() when done.
+    """
+
+    def __init__(self, urls, max_per_host=DEFAULT_MAX_PER_HOST, lookahead=DEFAULT_LOOKAHEAD, on_ready=None):
+        self.max_per_host = max(1, max_per_host)
+        self.lookahead = max(1, lookahead)
+        self.on_ready = on_ready
+        self.exhausted = False
+        self.error = None
+        self.pending = OrderedDict()  # host -> deque of URLs, least recently served host first
+        self.buffered = 0
+        self.in_flight = Counter()
+        self.last_host = {}
+        self.incoming = queue.Queue(maxsize=self.lookahead)
+        self.stopped = threading.Event()
+        self.feeder = threading.Thread(target=self._feed, args=(urls,), name="url-feeder", daemon=True)
+        self.feeder.start()
+
+    def _feed(self, urls):
+        try:
+            for url in urls:
+                if not self._put(url):
+                    return
+        except Exception as e:
+            # Raised by take() once the URLs read before the error are handed out
+            self.error = e
+        self._put(FEED_END)
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.incoming.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            if self.on_ready and not self.stopped.is_set():
+                self.on_ready()
+            return True
+        return False
+
+    def _fill(self):
+        while not self.exhausted and self.buffered < self.lookahead:
+            try:
+                url = self.incoming.get_nowait()
+            except queue.Empty:
+                break
+            if url is FEED_END:
+                self.exhausted = True
+                break
+            self.pending.setdefault(host_key(url), deque()).append(url)
+            self.buffered += 1
+
+    def _has_capacity(self, host):
+        return host in self.pending and self.in_flight[host] < self.max_per_host
+
+    def take(self, worker):
+        """Next URL for a worker, None if none can be captured yet, or DONE.
+
+        None means every waiting host is at its limit or the feeder hasn't
+        read the next URL yet. Raises the error the URL list failed with.
+        """
+        self._fill()
+        if not self.buffered:
+            if not self.exhausted:
+                return None
+            if self.error:
+                raise self.error
+            return DONE
+
+        host = self.last_host.get(worker)
+        if not self._has_capacity(host):
+            host = next((candidate for candidate in self.pending if self._has_capacity(candidate)), None)
+            if host is None:
+                return None
+            # Served now, so it goes to the back of the rotation
+            self.pending.move_to_end(host)
+
+        urls = self.pending[host]
+        url = urls.popleft()
+        if not urls:
+            del self.pending[host]
+        self.buffered -= 1
+        self.in_flight[host] += 1
+        self.last_host[worker] = host
+        return url
+
+    def release(self, url):
+        """Mark a URL handed out by take() as finished."""
+        host = host_key(url)
+        self.in_flight[host] -= 1
+        if self.in_flight[host] <= 0:
+            del self.in_flight[host]
+
+    def close(self):
+        """Stop the feeder thread, e.g. when the capture was aborted."""
+        self.stopped.set()
@@ -0,0 +1,31 @@
+"""Perceptual hashes used to spot final screenshots identical to the initial ones.
+
+dHash: the image is shrunk to a (HASH_SIZE + 1) x HASH_SIZE grayscale
+thumbnail and every bit says whether a pixel is brighter than its right
+neighbour. Near-identical images get hashes that differ in few bits.
+"""
+import io
+from PIL import Image
+
+# 16 x 16 = 256 bits, sensitive enough to notice e.g. a cookie banner appearing
+HASH_SIZE = 16
+
+def dhash(png, hash_size=HASH_SIZE):
+    """Difference hash of PNG bytes as an int."""
+    with Image.open(io.BytesIO(png)) as img:
+        thumbnail = img.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    pixels = list(thumbnail.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+def hash_hex(value, hash_size=HASH_SIZE):
+    """Fixed-width hex form of a hash, as stored in the journal."""
+    return f"{value:0{hash_size * hash_size // 4}x}"
@@ -0,0 +1,64 @@
+"""Manifest of processed screenshots, used to skip images that are up to date.
+
+image_manifest.json in a screenshot folder records, per source PNG, its
+size, modification time and SHA-256, the processing parameters and the
+outputs written from it. A source is only processed again when it is new,
+its content changed, the parameters changed or an output is missing.
+"""
+import os
+import json
+import hashlib
+
+MANIFEST_FILE = "image_manifest.json"
+
+def bytes_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+class ImageManifest:
+    """Per-folder record of which screenshots have current derivatives."""
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, MANIFEST_FILE)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def is_current(self, img_path, params):
+        """True if img_path was processed with params and nothing changed since."""
+        entry = self.entries.get(os.path.basename(img_path))
+        if not entry or entry.get("params") != params:
+            return False
+        if not all(os.path.exists(os.path.join(self.folder_path, output)) for output in entry["outputs"]):
+            return False
+        stat = os.stat(img_path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        # Touched but maybe not changed (e.g. copied): compare the content
+        with open(img_path, 'rb') as f:
+            if bytes_sha256(f.read()) != entry["sha256"]:
+                return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def update(self, img_path, params, sha256, outputs):
+        """Record that img_path (with content hash sha256) produced outputs."""
+        stat = os.stat(img_path)
+        self.entries[os.path.basename(img_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "params": params,
+            "outputs": [os.path.relpath(output, self.folder_path) for output in outputs],
+        }
+
+    def save(self):
+        """Write the manifest atomically."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
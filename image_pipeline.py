@@ -0,0 +1,155 @@
+"""Saving screenshots in the requested image formats straight after capture.
+
+The PNG bytes returned by the browser are handed to the encoder in memory,
+so a run can write resized PNGs and WebPs (the files process_images()
+creates) without first writing and re-reading the full-size PNG.
+ImagePipeline does the encoding in a pool of processes, overlapping it
+with the browser work.
+"""
+import os
+import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from process_last_screenshots import save_screenshot_outputs, output_path
+from image_hash import hamming
+
+# Formats a screenshot can be saved in, see save_screenshot_outputs()
+OUTPUT_FORMATS = ("png", "resized", "webp")
+
+# What to do with a final screenshot that matches the initial one
+DUPLICATE_MODES = ("keep", "drop", "link")
+
+def parse_outputs(names):
+    """Turn a comma-separated list of output formats into a tuple."""
+    outputs = tuple(name.strip().lower() for name in names.split(",") if name.strip())
+    unknown = [name for name in outputs if name not in OUTPUT_FORMATS]
+    if unknown or not outputs:
+        raise ValueError(f"Unknown output format '{', '.join(unknown)}'. "
+                         f"Use a comma-separated list of: {', '.join(OUTPUT_FORMATS)}")
+    return outputs
+
+def link_file(source, target):
+    """Hard-link target to source, copying where hard links are not supported."""
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+class ImageWriter:
+    """Writes captured screenshots in the configured formats.
+    
+    duplicates decides what happens to a final screenshot whose perceptual
+    hash is within hash_threshold bits of the initial one: "keep" saves it
+    anyway, "drop" skips it and "link" hard-links the initial files.
+    
+    With a BlobStore every file is stored once in the shared store and
+    hard-linked into the run folder.
+    """
+
+    def __init__(self, outputs=("png",), resize_width=800, duplicates="keep", hash_threshold=0, blob_store=None):
+        self.outputs = tuple(outputs)
+        self.resize_width = resize_width
+        self.duplicates = duplicates
+        self.hash_threshold = hash_threshold
+        self.blob_store = blob_store
+
+    def write(self, path, png):
+        """Save PNG bytes for the screenshot file `path` in every output format."""
+        return save_screenshot_outputs(png, os.path.dirname(path), os.path.basename(path),
+                                       self.outputs, self.resize_width, self.blob_store)
+
+    def is_duplicate(self, initial_hash, final_hash):
+        return (self.duplicates != "keep" and initial_hash is not None
+                and hamming(initial_hash, final_hash) <= self.hash_threshold)
+
+    def write_final(self, initial_path, final_path, png, initial_hash, final_hash):
+        """Save a final screenshot unless it duplicates the initial one.
+        
+        Returns "saved", "linked" or "dropped".
+        """
+        if not self.is_duplicate(initial_hash, final_hash):
+            self.write(final_path, png)
+            return "saved"
+        if self.duplicates == "link":
+            self.link(initial_path, final_path)
+            return "linked"
+        return "dropped"
+
+    def link(self, source_path, target_path):
+        """Make target_path's files hard links of source_path's files in every output format."""
+        for output in self.outputs:
+            target = output_path(os.path.dirname(target_path), os.path.basename(target_path), output)
+            link_file(output_path(os.path.dirname(source_path), os.path.basename(source_path), output), target)
+
+    def close(self):
+        """Nothing to flush, screenshots are written synchronously."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ImagePipeline(ImageWriter):
+    """ImageWriter that encodes in a process pool while capturing continues.
+
+    write() only queues the screenshot. At most max_pending screenshots
+    (default: two per worker) wait for encoding; when the pool falls
+    behind, write() blocks until a slot frees up, so memory stays bounded.
+    """
+
+    def __init__(self, outputs=("png",), resize_width=800, duplicates="keep", hash_threshold=0, blob_store=None,
+                 workers=None, max_pending=None):
+        super().__init__(outputs, resize_width, duplicates, hash_threshold, blob_store)
+        self.workers = workers or os.cpu_count() or 1
+        # Forking a process that already runs capture threads can copy a held lock into the child
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.slots = threading.BoundedSemaphore(max_pending or self.workers * 2)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.encoded = 0
+        self.errors = 0
+
+    def write(self, path, png):
+        """Queue PNG bytes for encoding; returns no paths as nothing is written yet."""
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(save_screenshot_outputs, png, os.path.dirname(path),
+                                          os.path.basename(path), self.outputs, self.resize_width,
+                                          self.blob_store)
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.pending[path] = future
+        future.add_done_callback(lambda done: self._finished(path, done))
+        return []
+
+    def link(self, source_path, target_path):
+        """Link to source_path's files once they have been encoded."""
+        with self.lock:
+            future = self.pending.get(source_path)
+        if future is not None:
+            future.exception()  # waits for the encoding to finish
+        super().link(source_path, target_path)
+
+    def _finished(self, path, future):
+        self.slots.release()
+        error = future.exception()
+        with self.lock:
+            if self.pending.get(path) is future:
+                del self.pending[path]
+            if error:
+                self.errors += 1
+            else:
+                self.encoded += 1
+        if error:
+            print(f"Error encoding {os.path.basename(path)}: {error}")
+
+    def close(self):
+        """Wait until every queued screenshot is encoded."""
+        self.executor.shutdown(wait=True)
+        print(f"Encoded {self.encoded} screenshots in {self.workers} processes ({self.errors} errors)")
@@ -0,0 +1,211 @@
+"""Wait for pages to settle instead of sleeping for a fixed time.
+
+A page counts as ready once document.readyState is "complete", no request
+has been in flight for network_idle_ms, the DOM has not changed for
+dom_quiet_ms, web fonts are loaded and the images in the viewport are
+decoded. Every wait is capped so one URL never takes longer than max_wait.
+
+The cdp engine sees every request of the tab (CDPTab.network_idle); with
+selenium the page script counts the fetch() and XMLHttpRequest calls made
+after load and the resources that finish loading.
+"""
+import time
+import asyncio
+
+# Fixed mode sleeps in seconds after load, after scrolling down and after
+# scrolling back up; in ready mode the share of the wait budget of each step
+PAUSES = (10, 3, 2)
+SCROLLS = (None, "window.scrollTo(0, document.body.scrollHeight);", "window.scrollTo(0, 0);")
+
+# Resolves with {ready, elapsed} once the page is settled or max_wait_ms passes
+READY_FUNCTION = """
+function (networkIdleMs, domQuietMs, maxWaitMs) {
+    return new Promise(function (resolve) {
+        var start = performance.now();
+        var lastMutation = start;
+        var lastResource = start;
+        var fontsReady = !document.fonts;
+        var imagesReady = false;
+        var decoding = false;
+
+        var mutations = new MutationObserver(function () { lastMutation = performance.now(); });
+        mutations.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+
+        // Requests made by the page's scripts, counted from the first call on
+        var requests = window.__pageWaitRequests;
+        if (!requests && networkIdleMs > 0) {
+            requests = window.__pageWaitRequests = {active: 0, changed: start};
+            var requestDone = function () { requests.active--; requests.changed = performance.now(); };
+            if (window.fetch) {
+                var fetch = window.fetch;
+                window.fetch = function () {
+                    requests.active++;
+                    return fetch.apply(this, arguments).finally(requestDone);
+                };
+            }
+            var send = XMLHttpRequest.prototype.send;
+            XMLHttpRequest.prototype.send = function () {
+                requests.active++;
+                this.addEventListener('loadend', requestDone, {once: true});
+                return send.apply(this, arguments);
+            };
+        }
+
+        var resources = null;
+        if (window.PerformanceObserver) {
+            try {
+                resources = new PerformanceObserver(function () { lastResource = performance.now(); });
+                resources.observe({type: 'resource', buffered: false});
+            } catch (e) {
+                resources = null;
+            }
+        }
+
+        if (document.fonts) {
+            document.fonts.ready.then(function () { fontsReady = true; }, function () { fontsReady = true; });
+        }
+
+        function visibleImages() {
+            var height = window.innerHeight, width = window.innerWidth;
+            return Array.prototype.filter.call(document.images, function (img) {
+                var rect = img.getBoundingClientRect();
+                return rect.bottom > 0 && rect.right > 0 && rect.top < height && rect.left < width;
+            });
+        }
+
+        function decodeImages() {
+            decoding = true;
+            var pending = visibleImages().map(function (img) {
+                if (!img.complete) {
+                    return new Promise(function (done) {
+                        img.addEventListener('load', done, {once: true});
+                        img.addEventListener('error', done, {once: true});
+                    });
+                }
+                return img.decode ? img.decode().catch(function () {}) : Promise.resolve();
+            });
+            Promise.all(pending).then(function () { imagesReady = true; });
+        }
+
+        function finish(ready) {
+            clearInterval(timer);
+            mutations.disconnect();
+            if (resources) { resources.disconnect(); }
+            resolve({ready: ready, elapsed: Math.round(performance.now() - start)});
+        }
+
+        var timer = setInterval(function () {
+            var now = performance.now();
+            if (now - start >= maxWaitMs) { return finish(false); }
+            if (document.readyState !== 'complete') { return; }
+            if (!decoding) { decodeImages(); }
+            var requestsIdle = !requests || (requests.active <= 0 && now - requests.changed >= networkIdleMs);
+            if (fontsReady && imagesReady && requestsIdle &&
+                    now - lastResource >= networkIdleMs &&
+                    now - lastMutation >= domQuietMs) {
+                finish(true);
+            }
+        }, 50);
+    });
+}
+"""
+
+class PageWait:
+    """Wait strategy shared by the capture engines.
+
+    mode "ready" waits for readiness (capped by max_wait seconds per URL);
+    mode "fixed" keeps the original fixed sleeps.
+    """
+
+    def __init__(self, mode="ready", max_wait=15.0, network_idle_ms=500, dom_quiet_ms=500):
+        self.mode = mode
+        self.max_wait = max_wait
+        self.network_idle_ms = network_idle_ms
+        self.dom_quiet_ms = dom_quiet_ms
+
+    def budget(self, max_wait=None):
+        """Longest time settle() can take for one URL, in seconds."""
+        if self.mode == "fixed":
+            return sum(PAUSES)
+        return max_wait or self.max_wait
+
+    def deadline(self, max_wait=None):
+        """Return the time by which this URL's waits must be finished."""
+        return time.monotonic() + (max_wait or self.max_wait)
+
+    def step_deadline(self, deadline, step):
+        """Deadline of settle() step `step`: its PAUSES share of the time left.
+
+        Time a step doesn't use carries over to the next ones, so the scrolls
+        still get their share when the page is slow to load.
+        """
+        now = time.monotonic()
+        return now + max(0, deadline - now) * PAUSES[step] / sum(PAUSES[step:])
+
+    def _script_args(self, deadline):
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        return self.network_idle_ms, self.dom_quiet_ms, remaining_ms
+
+    def pause(self, driver, fixed_seconds, deadline):
+        """Wait until the page is ready (or fixed_seconds in fixed mode)."""
+        if self.mode == "fixed":
+            time.sleep(fixed_seconds)
+            return True
+        network_idle_ms, dom_quiet_ms, remaining_ms = self._script_args(deadline)
+        if remaining_ms <= 0:
+            return False
+        driver.set_script_timeout(remaining_ms / 1000 + 5)
+        result = driver.execute_async_script(
+            "var done = arguments[arguments.length - 1];"
+            f"({READY_FUNCTION})(arguments[0], arguments[1], arguments[2]).then(done);",
+            network_idle_ms, dom_quiet_ms, remaining_ms
+        )
+        return bool(result and result.get("ready"))
+
+    async def pause_async(self, tab, fixed_seconds, deadline):
+        """pause() for a cdp_engine tab."""
+        if self.mode == "fixed":
+            await asyncio.sleep(fixed_seconds)
+            return True
+        while True:
+            network_idle_ms, dom_quiet_ms, remaining_ms = self._script_args(deadline)
+            if remaining_ms <= 0:
+                return False
+            # Network idle is checked on the tab, which also sees requests the page script can't
+            result = await tab.evaluate(f"({READY_FUNCTION})(0, {dom_quiet_ms}, {remaining_ms})")
+            if not (result and result.get("ready")):
+                return False
+            if tab.network_idle(network_idle_ms / 1000):
+                return True
+            while not tab.network_idle(network_idle_ms / 1000):
+                if time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(0.05)
+            # The late responses may have changed the page, check it again
+
+    def settle(self, driver, max_wait=None):
+        """Wait for the page, scroll to the bottom and back to trigger lazy loading.
+        
+        max_wait overrides the wait budget for this URL (see TimingHistory).
+        """
+        deadline = self.deadline(max_wait)
+        ready = True
+        for step, (scroll, seconds) in enumerate(zip(SCROLLS, PAUSES)):
+            if scroll:
+                driver.execute_script(scroll)
+            ready = self.pause(driver, seconds, self.step_deadline(deadline, step)) and ready
+        if not ready:
+            print(f"Page not fully settled after {max_wait or self.max_wait}s, taking screenshot anyway")
+        return ready
+
+    async def settle_async(self, tab, max_wait=None):
+        """settle() for a cdp_engine tab."""
+        deadline = self.deadline(max_wait)
+        ready = True
+        for step, (scroll, seconds) in enumerate(zip(SCROLLS, PAUSES)):
+            if scroll:
+                await tab.evaluate(scroll)
+            ready = await self.pause_async(tab, seconds, self.step_deadline(deadline, step)) and ready
+        if not ready:
+            print(f"Page not fully settled after {max_wait or self.max_wait}s, taking screenshot anyway")
+        return ready
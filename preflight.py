@@ -0,0 +1,208 @@
+"""Quick reachability check of the URLs before they are sent to a browser.
+
+A URL whose host does not resolve or refuses connections otherwise costs
+a browser navigation that can hang until the page load timeout. The
+preflight resolves each host and opens a TCP connection (with a TLS
+handshake for https) to it, many hosts at a time in a background thread,
+while the browsers capture the URLs that already passed. Certificates
+are not verified: Chrome still shows a page for those. Each host is
+checked once and the result is reused for its other URLs.
+
+Behind a proxy direct connections may fail although Chrome can reach the
+sites; turn the preflight off there (--no-preflight).
+"""
+import ssl
+import queue
+import socket
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from url_source import UrlSet
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 100
+# Reachable URLs waiting for a browser before the checks pause
+DEFAULT_AHEAD = 2000
+# Hosts whose result is remembered
+HOST_CACHE_SIZE = 10000
+
+# Chrome shows its own error page (chrome-error://chromewebdata/) when a navigation fails
+CHROME_ERROR_PREFIX = "chrome-error://"
+CHROME_ERROR_CODE_SCRIPT = "var e = document.querySelector('.error-code'); return e ? e.textContent : null;"
+
+class UnreachableError(Exception):
+    """The browser could not load a page (it is showing Chrome's error page)."""
+
+def chrome_error(driver):
+    """Chrome's error code (e.g. ERR_NAME_NOT_RESOLVED) if the driver shows an error page, else None."""
+    if not driver.current_url.startswith(CHROME_ERROR_PREFIX):
+        return None
+    try:
+        code = driver.execute_script(CHROME_ERROR_CODE_SCRIPT)
+    except Exception:
+        code = None
+    return (code or "").strip() or "page could not be loaded"
+
+def url_address(url):
+    """(host, port, tls) that a browser would connect to for url."""
+    parts = urlsplit(url if "://" in url else "https://" + url)
+    tls = parts.scheme != "http"
+    return parts.hostname, parts.port or (443 if tls else 80), tls
+
+async def check_address(host, port, tls, timeout=DEFAULT_TIMEOUT):
+    """Resolve host and connect to it; return None if reachable, else the reason."""
+    if not host:
+        return "no host name in URL"
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+    except (socket.gaierror, UnicodeError):
+        return f"DNS lookup failed for {host}"
+    except asyncio.TimeoutError:
+        return f"DNS lookup for {host} timed out after {timeout:g}s"
+
+    context = None
+    if tls:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host if tls else None), timeout)
+    except asyncio.TimeoutError:
+        return f"connection to {host}:{port} timed out after {timeout:g}s"
+    except ssl.SSLError as e:
+        return f"TLS handshake with {host}:{port} failed: {e.reason or e}"
+    except OSError as e:
+        return f"connection to {host}:{port} failed: {e.strerror or e}"
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return None
+
+class Preflight:
+    """Filters unreachable URLs out of a URL stream."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, concurrency=DEFAULT_CONCURRENCY, ahead=DEFAULT_AHEAD):
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.ahead = max(1, ahead)
+        # URLs checked and those whose last check failed; a URL checked again on a retry pass counts once
+        self.checked_urls = UrlSet()
+        self.unreachable_urls = UrlSet()
+        # Checks that found a URL unreachable, including those of retry passes
+        self.rejected = 0
+        self.hosts = OrderedDict()  # (host, port, tls) -> future with the check result
+        self.stopped = threading.Event()
+
+    @property
+    def checked(self):
+        return len(self.checked_urls)
+
+    @property
+    def unreachable(self):
+        return len(self.unreachable_urls)
+
+    async def check(self, url):
+        """None if url's host is reachable, else the reason it is not."""
+        address = url_address(url)
+        result = self.hosts.get(address)
+        if result is None:
+            result = asyncio.ensure_future(check_address(*address, timeout=self.timeout))
+            self.hosts[address] = result
+            if len(self.hosts) > HOST_CACHE_SIZE:
+                self.hosts.popitem(last=False)
+        else:
+            self.hosts.move_to_end(address)
+        return await asyncio.shield(result)
+
+    def live_urls(self, urls, on_unreachable):
+        """Yield the reachable URLs of urls while checking ahead in a background thread.
+
+        on_unreachable(url, reason) is called from that thread for the others.
+        URLs come out in the order their checks finish.
+        """
+        live = queue.Queue(maxsize=self.ahead)
+        done = object()
+        errors = []
+
+        def put(url):
+            # Wait for room, unless the consumer has gone away
+            while not self.stopped.is_set():
+                try:
+                    live.put(url, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def run():
+            try:
+                asyncio.run(self._check_all(urls, put, on_unreachable))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(done)
+
+        self.stopped.clear()
+        thread = threading.Thread(target=run, name="preflight", daemon=True)
+        thread.start()
+        try:
+            while True:
+                url = live.get()
+                if url is done:
+                    break
+                yield url
+        finally:
+            self.stopped.set()
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    async def _check_all(self, urls, put, on_unreachable):
+        loop = asyncio.get_running_loop()
+        # The cached checks belong to the previous pass's event loop, and a retry pass should check again anyway
+        self.hosts = OrderedDict()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        # Handing URLs to the consumer may block, so it happens off the event loop
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="preflight-put") as handoff:
+            async def check(url):
+                try:
+                    try:
+                        reason = await self.check(url)
+                    except ValueError as e:
+                        # A port out of range or not a number; no browser could load it either
+                        reason = f"invalid URL: {e}"
+                    except Exception as e:
+                        # Let the browser try rather than drop the URL
+                        print(f"Could not check {url}: {e}")
+                        reason = None
+                    self.checked_urls.add(url)
+                    if reason:
+                        self.rejected += 1
+                        self.unreachable_urls.add(url)
+                        print(f"Unreachable: {url} ({reason})")
+                        try:
+                            on_unreachable(url, reason)
+                        except Exception as e:
+                            print(f"Error recording result for {url}: {e}")
+                    else:
+                        self.unreachable_urls.discard(url)
+                        await loop.run_in_executor(handoff, put, url)
+                finally:
+                    slots.release()
+
+            for url in urls:
+                if self.stopped.is_set():
+                    break
+                await slots.acquire()
+                task = asyncio.ensure_future(check(url))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                # One failed check must not end the others
+                await asyncio.gather(*tasks, return_exceptions=True)
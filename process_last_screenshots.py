@@ -1,9 +1,17 @@
 import os
+import io
 import glob
-import sys
 import time
 from PIL import Image
 import re
+import json
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from image_manifest import ImageManifest, bytes_sha256
+
+# Folders the screenshot scripts write their timestamped runs into
+SCREENSHOT_BASE_DIRS = ["screenshots", "screenshots_widescreen", "screenshots_fourbythree", "screenshots_full", "screenshots_multi"]
 
 def find_latest_directory(base_dir):
     """Find the most recent timestamped directory."""
@@ -29,153 +37,335 @@ def find_latest_directory(base_dir):
     latest_dir = os.path.join(base_dir, timestamp_dirs[0])
     return latest_dir
 
-def process_images(folder_path, resize=True, resize_width=800, save_webp=True):
-    """Process images in the specified folder."""
+# WebP quality used for every WebP output
+WEBP_QUALITY = 90
+
+# Large downscales first shrink the image by an integer factor with the cheap
+# Image.reduce() box filter, leaving at least this factor for LANCZOS
+REDUCING_GAP = 3.0
+
+def resize_to_width(img, resize_width):
+    """Resize an image to resize_width, keeping the aspect ratio (LANCZOS).
+    
+    Images more than REDUCING_GAP times wider than the target go through
+    Image.reduce() first, which makes e.g. 1920 -> 320 px several times
+    faster with no visible difference. (Image.draft() would be the JPEG
+    equivalent, but screenshots are PNGs.)
+    """
+    width_percent = (resize_width / float(img.size[0]))
+    target_height = int((float(img.size[1]) * float(width_percent)))
+    return img.resize((resize_width, target_height), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def output_path(folder_path, img_filename, output):
+    """Path of a screenshot's file for one output format (see save_screenshot_outputs)."""
+    if output == "resized":
+        return os.path.join(folder_path, "resized", img_filename)
+    if output == "webp":
+        return os.path.join(folder_path, "webp", os.path.splitext(img_filename)[0] + ".webp")
+    return os.path.join(folder_path, img_filename)
+
+def write_output(path, data, blob_store=None):
+    """Write a file's bytes, through the BlobStore if one is used."""
+    if blob_store is not None:
+        blob_store.write(path, data)
+        return
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def encode_image(img, **params):
+    output = io.BytesIO()
+    img.save(output, **params)
+    return output.getvalue()
+
+def save_screenshot_outputs(png, folder_path, img_filename, outputs, resize_width=800, blob_store=None):
+    """Write the requested formats of one screenshot from its PNG bytes.
+    
+    outputs is a collection of "png" (the PNG as captured), "resized"
+    (resized/<name>.png) and "webp" (webp/<name>.webp), the same files
+    process_images() creates. The PNG is decoded at most once, in memory,
+    and the captured bytes are written as they are, without re-encoding.
+    With a BlobStore the files are hard links into the shared store.
+    Returns the paths written.
+    """
+    written = []
+    if "png" in outputs:
+        path = output_path(folder_path, img_filename, "png")
+        write_output(path, png, blob_store)
+        written.append(path)
+    if "resized" not in outputs and "webp" not in outputs:
+        return written
+    
+    with Image.open(io.BytesIO(png)) as img:
+        img = resize_to_width(img, resize_width) if resize_width > 0 else img
+        if "resized" in outputs:
+            path = output_path(folder_path, img_filename, "resized")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_output(path, encode_image(img, format="PNG"), blob_store)
+            written.append(path)
+        if "webp" in outputs:
+            path = output_path(folder_path, img_filename, "webp")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_output(path, encode_image(img, format="WEBP", quality=WEBP_QUALITY), blob_store)
+            written.append(path)
+    return written
+
+# Folder (inside the screenshot folder) for the multi-width outputs
+RESPONSIVE_DIR = "responsive"
+RESPONSIVE_INDEX = "index.json"
+
+def parse_widths(text):
+    """Parse a comma-separated list of widths, e.g. "320,640,800,1280"."""
+    widths = sorted({int(width) for width in text.split(",") if width.strip()}, reverse=True)
+    if not widths or widths[-1] <= 0:
+        raise ValueError(f"Invalid widths: {text}")
+    return widths
+
+def save_responsive_outputs(png, folder_path, img_filename, widths, save_png=True, save_webp=True):
+    """Write one screenshot at several widths from a single decode.
+    
+    Sizes are made in a cascade, largest first, each one downscaled from
+    the previous (larger) size rather than from the full-resolution image.
+    Files go to responsive/<width>/; widths larger than the screenshot are
+    skipped. Returns (written paths, variants) where variants lists the
+    width, height and relative file names of every size.
+    """
+    written = []
+    variants = []
+    base_name = os.path.splitext(img_filename)[0]
+    with Image.open(io.BytesIO(png)) as source:
+        img = source
+        for width in sorted(widths, reverse=True):
+            if width > source.size[0]:
+                continue
+            img = resize_to_width(img, width)
+            width_dir = os.path.join(folder_path, RESPONSIVE_DIR, str(width))
+            os.makedirs(width_dir, exist_ok=True)
+            variant = {"width": img.size[0], "height": img.size[1]}
+            if save_png:
+                path = os.path.join(width_dir, img_filename)
+                img.save(path)
+                written.append(path)
+                variant["png"] = os.path.relpath(path, folder_path).replace(os.sep, "/")
+            if save_webp:
+                path = os.path.join(width_dir, base_name + ".webp")
+                img.save(path, format="WEBP", quality=WEBP_QUALITY)
+                written.append(path)
+                variant["webp"] = os.path.relpath(path, folder_path).replace(os.sep, "/")
+            variants.append(variant)
+    return written, variants
+
+def update_responsive_index(folder_path, variants_by_file):
+    """Merge {filename: variants} into responsive/index.json."""
+    index_path = os.path.join(folder_path, RESPONSIVE_DIR, RESPONSIVE_INDEX)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        index = {}
+    index.update(variants_by_file)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(temp_path, index_path)
+
+def process_image_file(img_path, resize=True, resize_width=800, save_webp=True, widths=None):
+    """Create the resized PNG and/or WebP of one screenshot.
+    
+    With a list of widths every width is written to responsive/<width>/
+    (see save_responsive_outputs) instead of using resize_width.
+    
+    Returns (filename, error, info): error is None on success and info then
+    holds the source's "sha256", the "outputs" written and, for widths,
+    the "variants" for the index. Runs in the worker processes of
+    process_images(), so it never raises.
+    """
+    img_filename = os.path.basename(img_path)
+    outputs = [name for name, wanted in (("resized", resize), ("webp", save_webp)) if wanted]
+    info = {}
+    try:
+        with open(img_path, 'rb') as f:
+            png = f.read()
+        if widths:
+            written, info["variants"] = save_responsive_outputs(png, os.path.dirname(img_path), img_filename,
+                                                                widths, save_png=resize, save_webp=save_webp)
+        else:
+            written = save_screenshot_outputs(png, os.path.dirname(img_path), img_filename, outputs, resize_width)
+    except Exception as e:
+        return img_filename, str(e), None
+    info.update({"sha256": bytes_sha256(png), "outputs": written})
+    return img_filename, None, info
+
+def processing_params(resize, resize_width, save_webp, widths=None):
+    """Settings that change the outputs; a change reprocesses every image."""
+    params = {"resize": resize, "resize_width": resize_width, "webp": save_webp,
+              "webp_quality": WEBP_QUALITY, "reducing_gap": REDUCING_GAP}
+    if widths:
+        params["widths"] = sorted(widths, reverse=True)
+        del params["resize_width"]
+    return params
+
+def process_images(folder_path, resize=True, resize_width=800, save_webp=True, workers=None, force=False,
+                   widths=None):
+    """Process images in the specified folder.
+    
+    Files are spread over `workers` processes (default: one per CPU core,
+    1 processes them in this process). Each file is decoded once and its
+    resized PNG and WebP are written from the same image. Results are
+    reported in file name order, with errors per file.
+    
+    With a list of widths (responsive mode) every image is written at all
+    those widths in one pass, into responsive/<width>/, and
+    responsive/index.json lists the sizes of every image. resize and
+    save_webp then select PNG and WebP files.
+    
+    Images whose outputs are up to date according to the folder's
+    image_manifest.json are skipped unless force is set. Returns the list
+    of (filename, error) tuples of the processed images.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
     print(f"Processing images in folder: {folder_path}")
-    print(f"- Resize: {resize} (width={resize_width})")
+    if widths:
+        print(f"- Responsive widths: {', '.join(str(width) for width in widths)} (PNG: {resize})")
+    else:
+        print(f"- Resize: {resize} (width={resize_width})")
     print(f"- WebP conversion: {save_webp}")
+    print(f"- Worker processes: {workers}")
     
     if not os.path.exists(folder_path):
         print(f"Error: Folder {folder_path} does not exist.")
-        return
+        return []
     
-    # Get all PNG images in the folder
-    png_files = glob.glob(os.path.join(folder_path, "*.png"))
+    # Get all PNG images in the folder, sorted so every run reports in the same order
+    png_files = sorted(glob.glob(os.path.join(folder_path, "*.png")))
     print(f"Found {len(png_files)} PNG images in the folder.")
     
     if len(png_files) == 0:
         print("No images to process.")
-        return
+        return []
     
-    # Process for resizing
-    if resize:
-        # Create resized directory
-        resized_dir = os.path.join(folder_path, "resized")
-        os.makedirs(resized_dir, exist_ok=True)
-        print(f"Created/verified resized directory: {resized_dir}")
-        
-        # Process each image for resizing
-        for img_path in png_files:
-            img_filename = os.path.basename(img_path)
-            resized_path = os.path.join(resized_dir, img_filename)
-            
-            try:
-                # Open and resize the image
-                img = Image.open(img_path)
-                print(f"Opened image: {img_filename} ({img.size[0]}x{img.size[1]})")
-                
-                # Calculate new height to maintain aspect ratio
-                width_percent = (resize_width / float(img.size[0]))
-                target_height = int((float(img.size[1]) * float(width_percent)))
-                
-                # Resize with LANCZOS resampling for quality
-                resized_img = img.resize((resize_width, target_height), Image.LANCZOS)
-                resized_img.save(resized_path)
-                
-                print(f"Resized: {img_filename} to {resize_width}x{target_height} -> {resized_path}")
-                img.close()
-            except Exception as e:
-                print(f"Error resizing {img_filename}: {e}")
-    
-    # Process for WebP conversion
-    if save_webp:
-        # Create WebP directory
-        webp_dir = os.path.join(folder_path, "webp")
-        os.makedirs(webp_dir, exist_ok=True)
-        print(f"Created/verified WebP directory: {webp_dir}")
-        
-        # Determine source files (original or resized)
-        source_files = []
-        if resize:
-            source_dir = os.path.join(folder_path, "resized")
-            source_files = glob.glob(os.path.join(source_dir, "*.png"))
-            print(f"Using {len(source_files)} resized images as source for WebP conversion")
+    if not resize and not save_webp:
+        print("Nothing to do.")
+        return []
+    
+    # Only new or changed images (or all after a settings change) need work
+    manifest = ImageManifest(folder_path)
+    params = processing_params(resize, resize_width, save_webp, widths)
+    if not force:
+        pending_files = [img_path for img_path in png_files if not manifest.is_current(img_path, params)]
+        if len(pending_files) < len(png_files):
+            print(f"Skipping {len(png_files) - len(pending_files)} images that are already up to date.")
+        png_files = pending_files
+    
+    task = partial(process_image_file, resize=resize, resize_width=resize_width, save_webp=save_webp, widths=widths)
+    results = []
+    try:
+        if workers > 1 and len(png_files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() yields results in input order; chunks keep the inter-process overhead low
+                chunksize = max(1, min(32, len(png_files) // (workers * 4)))
+                for result in report_results(executor.map(task, png_files, chunksize=chunksize)):
+                    results.append(result)
         else:
-            source_files = png_files
-            print(f"Using {len(source_files)} original images as source for WebP conversion")
-        
-        # Convert each image to WebP
-        for img_path in source_files:
-            img_filename = os.path.basename(img_path)
-            webp_filename = os.path.splitext(img_filename)[0] + ".webp"
-            webp_path = os.path.join(webp_dir, webp_filename)
-            
-            try:
-                # Open and convert the image
-                img = Image.open(img_path)
-                print(f"Converting to WebP: {img_filename}")
-                
-                # If resize is not already applied but is requested
-                if not resize and resize_width > 0:
-                    # Calculate new height to maintain aspect ratio
-                    width_percent = (resize_width / float(img.size[0]))
-                    target_height = int((float(img.size[1]) * float(width_percent)))
-                    
-                    # Resize with LANCZOS resampling for quality
-                    img = img.resize((resize_width, target_height), Image.LANCZOS)
-                    print(f"Resized during WebP conversion to {resize_width}x{target_height}")
-                
-                # Save as WebP with good quality
-                img.save(webp_path, format="WEBP", quality=90)
-                print(f"Saved WebP: {webp_path}")
-                img.close()
-            except Exception as e:
-                print(f"Error converting {img_filename} to WebP: {e}")
+            for result in report_results(map(task, png_files)):
+                results.append(result)
+    finally:
+        # Record what was finished, even if the run was interrupted
+        for img_path, (_, error, info) in zip(png_files, results):
+            if not error:
+                manifest.update(img_path, params, info["sha256"], info["outputs"])
+        manifest.save()
+        if widths:
+            update_responsive_index(folder_path, {img_filename: info["variants"]
+                                                  for img_filename, error, info in results if not error})
     
+    failed = sum(1 for _, error, _ in results if error)
+    print(f"Processed {len(results) - failed} images, {failed} errors.")
     print("Image processing completed.")
+    return [(img_filename, error) for img_filename, error, _ in results]
+
+def report_results(results):
+    """Print each (filename, error, info) result as it arrives and pass it on."""
+    for img_filename, error, info in results:
+        if error:
+            print(f"Error processing {img_filename}: {error}")
+        else:
+            print(f"Processed: {img_filename}")
+        yield img_filename, error, info
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create resized PNG and WebP copies of a screenshot run.")
+    parser.add_argument("folder", nargs="?", help="screenshot folder (default: the most recent run)")
+    parser.add_argument("resize_width", nargs="?", default="800", help="resize width in pixels (default: 800)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes (default: one per CPU core)")
+    parser.add_argument("--batch", action="store_true",
+                        help="do not ask for options, use the command line values")
+    parser.add_argument("--no-resize", action="store_true", help="do not write resized PNGs")
+    parser.add_argument("--no-webp", action="store_true", help="do not write WebP files")
+    parser.add_argument("--widths",
+                        help="comma-separated widths (e.g. 320,640,800,1280) written in one pass into "
+                             "responsive/<width>/ with an index.json, instead of one resize width")
+    parser.add_argument("--force", action="store_true",
+                        help="process every image, even if its outputs are up to date")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
+    
     # First check if specific directory was provided
-    if len(sys.argv) > 1:
-        folder_path = sys.argv[1]
+    if args.folder:
+        folder_path = args.folder
     else:
-        # Find the latest directory in screenshots or screenshots_full
+        # Find the latest directory across all screenshot folders
         print("Looking for the most recent screenshot directory...")
-        latest_regular = find_latest_directory("screenshots")
-        latest_full = find_latest_directory("screenshots_full")
+        latest_dirs = [d for d in (find_latest_directory(base) for base in SCREENSHOT_BASE_DIRS) if d]
         
-        if latest_regular and latest_full:
-            # Compare timestamps to find the most recent one
-            if os.path.getmtime(latest_regular) > os.path.getmtime(latest_full):
-                folder_path = latest_regular
-                print(f"Using most recent regular screenshots directory: {folder_path}")
-            else:
-                folder_path = latest_full
-                print(f"Using most recent full-page screenshots directory: {folder_path}")
-        elif latest_regular:
-            folder_path = latest_regular
-            print(f"Using most recent regular screenshots directory: {folder_path}")
-        elif latest_full:
-            folder_path = latest_full
-            print(f"Using most recent full-page screenshots directory: {folder_path}")
-        else:
+        if not latest_dirs:
             print("No screenshot directories found. Please specify directory as argument.")
             return
+        
+        # Compare timestamps to find the most recent one
+        folder_path = max(latest_dirs, key=os.path.getmtime)
+        print(f"Using most recent screenshots directory: {folder_path}")
     
     # Get resize width if provided
     resize_width = 800  # Default
-    if len(sys.argv) >= 3:
+    try:
+        resize_width = int(args.resize_width)
+    except ValueError:
+        print(f"Invalid resize width: {args.resize_width}. Using default (800px).")
+    
+    resize = not args.no_resize
+    save_webp = not args.no_webp
+    widths = None
+    if args.widths:
         try:
-            resize_width = int(sys.argv[2])
+            widths = parse_widths(args.widths)
         except ValueError:
-            print(f"Invalid resize width: {sys.argv[2]}. Using default (800px).")
+            print(f"Invalid widths: {args.widths}. Use e.g. 320,640,800,1280.")
+            return
     
     # Ask user for options
-    resize = input("Resize images? (Y/N, default=Y): ").strip().upper() != "N"
-    
-    if resize:
-        width_input = input(f"Resize width (default={resize_width}): ").strip()
-        if width_input:
-            try:
-                resize_width = int(width_input)
-            except ValueError:
-                print(f"Invalid width. Using {resize_width}px.")
-    
-    save_webp = input("Convert to WebP? (Y/N, default=Y): ").strip().upper() != "N"
+    if not args.batch:
+        resize = input("Resize images? (Y/N, default=Y): ").strip().upper() != "N"
+        
+        if resize and not widths:
+            width_input = input(f"Resize width (default={resize_width}): ").strip()
+            if width_input:
+                try:
+                    resize_width = int(width_input)
+                except ValueError:
+                    print(f"Invalid width. Using {resize_width}px.")
+        
+        save_webp = input("Convert to WebP? (Y/N, default=Y): ").strip().upper() != "N"
     
     # Process images
     print("\nStarting image processing...")
-    process_images(folder_path, resize=resize, resize_width=resize_width, save_webp=save_webp)
+    process_images(folder_path, resize=resize, resize_width=resize_width, save_webp=save_webp,
+                   workers=args.workers, force=args.force, widths=widths)
 
 if __name__ == "__main__":
     main()
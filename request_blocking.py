@@ -0,0 +1,146 @@
+"""Blocking ads, trackers and heavy resources while pages load.
+
+Requests are blocked with Network.setBlockedURLs, which takes URL
+patterns with * wildcards. The cdp engine blocks media and fonts by their
+resource type: Fetch.enable with resourceType patterns pauses only the
+matching requests, which the tab then fails (CDPTab.fail_requests), so
+the rest of the page loads without a round-trip. ChromeDriver doesn't
+pass on the Fetch.requestPaused events that would need an answer, so with
+selenium these types are blocked through the URL patterns that identify
+them (file extensions), which miss URLs without one. WebSockets are
+matched by their ws:// scheme in both engines, and beacons
+(navigator.sendBeacon) are turned into no-ops by a script that runs
+before the page's own scripts.
+
+Blocked requests show up as Network.loadingFailed events with a
+blockedReason or ERR_BLOCKED_BY_CLIENT; their number is added to each
+URL's record.
+"""
+import json
+
+# URL patterns used for each blockable resource type
+RESOURCE_TYPE_PATTERNS = {
+    "media": ["*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.m3u8*", "*.mpd", "*.mpd?*", "*.m4s*",
+              "*.mov", "*.mov?*", "*.mp3", "*.mp3?*", "*.ogg", "*.ogg?*"],
+    "font": ["*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*"],
+    "websocket": ["ws://*", "wss://*"],
+}
+RESOURCE_TYPES = tuple(RESOURCE_TYPE_PATTERNS) + ("beacon",)
+
+# Network.ResourceType the cdp engine intercepts instead of using the URL patterns
+FETCH_RESOURCE_TYPES = {"media": "Media", "font": "Font"}
+
+# Replaces navigator.sendBeacon with a no-op that counts the beacons it swallowed
+BEACON_SCRIPT = """
+(() => {
+    window.__blockedBeacons = 0;
+    navigator.sendBeacon = function() { window.__blockedBeacons += 1; return true; };
+})();
+"""
+BLOCKED_BEACONS_EXPRESSION = "window.__blockedBeacons || 0"
+
+def load_patterns(path):
+    """Read URL patterns from a file, one per line ('#' starts a comment)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def parse_resource_types(names):
+    """Turn a comma-separated list of resource types into a tuple."""
+    types = tuple(name.strip().lower() for name in names.split(",") if name.strip())
+    unknown = [name for name in types if name not in RESOURCE_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown resource type '{', '.join(unknown)}'. "
+                         f"Use a comma-separated list of: {', '.join(RESOURCE_TYPES)}")
+    return types
+
+def count_blocked(events):
+    """Number of Network.loadingFailed events caused by blocking."""
+    return sum(1 for event in events
+               if event.get("blockedReason") or event.get("errorText") == "net::ERR_BLOCKED_BY_CLIENT")
+
+def performance_log_events(entries, method):
+    """Params of the `method` events in ChromeDriver performance log entries."""
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if message.get("method") == method:
+            yield message.get("params", {})
+
+class RequestBlocker:
+    """Which requests to block, and how to set that up in a browser tab."""
+
+    def __init__(self, patterns=(), resource_types=()):
+        self.custom_patterns = list(patterns)
+        self.resource_types = tuple(resource_types)
+        self.patterns = self.url_patterns()
+        self.block_beacons = "beacon" in resource_types
+
+    @property
+    def enabled(self):
+        return bool(self.patterns) or self.block_beacons
+
+    def url_patterns(self, by_type=False):
+        """Patterns for Network.setBlockedURLs; by_type leaves out the FETCH_RESOURCE_TYPES."""
+        patterns = list(self.custom_patterns)
+        for resource_type in self.resource_types:
+            if not (by_type and resource_type in FETCH_RESOURCE_TYPES):
+                patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+        return patterns
+
+    def fetch_types(self):
+        """Network.ResourceTypes to intercept with Fetch when blocking by_type."""
+        return [FETCH_RESOURCE_TYPES[name] for name in self.resource_types if name in FETCH_RESOURCE_TYPES]
+
+    def commands(self, by_type=False):
+        """DevTools commands that turn blocking on for a tab (except the Fetch interception)."""
+        commands = [("Network.enable", {})]
+        patterns = self.url_patterns(by_type)
+        if patterns:
+            commands.append(("Network.setBlockedURLs", {"urls": patterns}))
+        if self.block_beacons:
+            commands.append(("Page.addScriptToEvaluateOnNewDocument", {"source": BEACON_SCRIPT}))
+        return commands
+
+    def apply(self, send):
+        """Enable blocking through send(method, params), e.g. driver.execute_cdp_cmd."""
+        for method, params in self.commands():
+            send(method, params)
+
+    async def apply_async(self, tab):
+        """apply() for a cdp_engine tab, which blocks media and fonts by type."""
+        for method, params in self.commands(by_type=True):
+            await tab.send(method, params)
+        if self.fetch_types():
+            await tab.fail_requests(self.fetch_types())
+
+    def blocked(self, driver):
+        """Blocked request counts for the current page of a selenium driver.
+        
+        Reads (and so empties) the performance log, which build_chrome_options
+        enables when blocking is on; call it once before navigating too.
+        """
+        events = performance_log_events(driver.get_log("performance"), "Network.loadingFailed")
+        counts = {"requests": count_blocked(events)}
+        if self.block_beacons:
+            counts["beacons"] = driver.execute_script(f"return {BLOCKED_BEACONS_EXPRESSION};") or 0
+        return counts
+
+    async def blocked_async(self, tab, failed_events):
+        """blocked() for a cdp_engine tab; failed_events is its Network.loadingFailed queue."""
+        events = []
+        while not failed_events.empty():
+            events.append(failed_events.get_nowait())
+        counts = {"requests": count_blocked(events)}
+        if self.block_beacons:
+            counts["beacons"] = await tab.evaluate(BLOCKED_BEACONS_EXPRESSION) or 0
+        return counts
+
+    def summary(self):
+        parts = []
+        if self.patterns:
+            parts.append(f"{len(self.patterns)} URL patterns")
+        if self.block_beacons:
+            parts.append("beacons")
+        return ", ".join(parts)
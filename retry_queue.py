@@ -0,0 +1,66 @@
+"""Retrying URLs that failed for a reason that may go away.
+
+A failure is transient when its error looks like a timeout, a dropped
+connection or a crashed browser; DNS, certificate and other errors are
+permanent. Transient failures are collected during a pass and captured
+again in a retry pass after the main one, waiting backoff seconds before
+the first retry pass and twice as long before each further one. A URL is
+retried at most max_retries times.
+"""
+import threading
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF = 30.0
+
+# Error text (lower case) of failures worth another try
+TRANSIENT_ERRORS = (
+    "timed out", "timeout",
+    "err_timed_out", "err_connection_reset", "err_connection_closed", "err_connection_timed_out",
+    "err_empty_response", "err_network_changed", "err_internet_disconnected", "err_network_io_suspended",
+    "err_http2_protocol_error", "err_quic_protocol_error", "err_address_unreachable",
+    "chrome not reachable", "browser could not be started", "connection closed", "disconnected", "session deleted", "no such window", "crashed",
+)
+
+def is_transient(error):
+    """True if an error message looks like a failure that may not happen again."""
+    error = (error or "").lower()
+    return any(pattern in error for pattern in TRANSIENT_ERRORS)
+
+class RetryQueue:
+    """Thread-safe collection of the URLs to capture again."""
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.passes = 0
+        self.pending = []
+        self.retries = {}  # url -> retries started so far
+        self.queued = 0
+        self.lock = threading.Lock()
+
+    def attempt(self, url):
+        """Attempt number of the current capture of url (1 for the main pass)."""
+        with self.lock:
+            return self.retries.get(url, 0) + 1
+
+    def add(self, url, record):
+        """Queue a failed URL if its error is transient and it has retries left."""
+        if not is_transient(record.get("error")):
+            return False
+        with self.lock:
+            if self.retries.get(url, 0) >= self.max_retries:
+                return False
+            self.pending.append(url)
+            self.queued += 1
+        return True
+
+    def next_pass(self):
+        """(delay in seconds, URLs) for the next retry pass, or None when nothing is left."""
+        with self.lock:
+            if not self.pending:
+                return None
+            urls, self.pending = self.pending, []
+            for url in urls:
+                self.retries[url] = self.retries.get(url, 0) + 1
+            self.passes += 1
+            return self.backoff * 2 ** (self.passes - 1), urls
@@ -0,0 +1,78 @@
+"""Append-only journal of finished URLs, used to resume interrupted runs.
+
+Every finished URL is appended to journal.jsonl in the run folder as one
+JSON line. When a run is resumed, URLs with an "ok" entry are skipped and
+all others are captured again.
+"""
+import os
+import json
+import time
+import threading
+from url_source import UrlSet, url_key
+
+JOURNAL_FILE = "journal.jsonl"
+
+class RunJournal:
+    """Thread-safe writer for a run's journal.jsonl."""
+
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, JOURNAL_FILE)
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'a', encoding='utf-8')
+        # Where this run's entries start, after those of the runs it resumes
+        self.start = self.file.tell()
+
+    def record(self, url, success, details=None):
+        """Append the outcome of one URL and flush it to disk."""
+        entry = {"url": url, "status": "ok" if success else "failed", "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if details:
+            entry.update(details)
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def iter_entries(run_dir, start=0):
+    """Yield the journal entries of a run one at a time, from offset start (a RunJournal's start)."""
+    path = os.path.join(run_dir, JOURNAL_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        f.seek(start)
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A crash can leave a half-written last line
+                continue
+
+def iter_final_entries(run_dir):
+    """Yield the last journal entry of every URL, in journal order.
+
+    A URL has several entries when it was retried or the run was resumed.
+    The journal is read twice so only a 64-bit hash per URL is held.
+    """
+    last = {}
+    for index, entry in enumerate(iter_entries(run_dir)):
+        last[url_key(entry["url"])] = index
+    for index, entry in enumerate(iter_entries(run_dir)):
+        if last.get(url_key(entry["url"])) == index:
+            yield entry
+
+def load_completed(run_dir):
+    """Return a UrlSet of the URLs the journal lists as captured."""
+    completed = UrlSet()
+    for entry in iter_entries(run_dir):
+        if entry.get("status") == "ok":
+            completed.add(entry["url"])
+    return completed
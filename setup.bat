@@ -29,6 +29,7 @@ echo Installing dependencies...
 call venv\Scripts\activate
 python -m pip install --upgrade pip
 pip install selenium==4.11.2
+pip install websockets==11.0.3
 
 :: Install pre-compiled Pillow wheel instead of building from source
 echo Installing Pillow (pre-compiled)...
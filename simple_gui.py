@@ -7,6 +7,7 @@ import subprocess
 import time
 import queue
 import glob
+from url_source import count_urls
 
 class WebsiteScreenshotGUI:
     def __init__(self, root):
@@ -24,7 +25,7 @@ class WebsiteScreenshotGUI:
         self.progress_var = tk.DoubleVar(value=0.0)
         self.status_var = tk.StringVar(value="Ready")
         self.total_urls = 0
-        self.processed_urls = 0
+        self.processed_urls = set()  # URLs seen, retries print "Processing:" again
         self.last_output_dir = None  # Track the last output directory
         self.processing_active = False  # Flag to track if processing is currently active
         
@@ -33,6 +34,9 @@ class WebsiteScreenshotGUI:
         self.resize_width = tk.IntVar(value=800)
         self.save_webp = tk.BooleanVar(value=True)
         
+        # Number of browsers capturing in parallel
+        self.workers = tk.IntVar(value=1)
+        
         # Create main frame
         main_frame = ttk.Frame(root, padding="10")
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -100,6 +104,19 @@ class WebsiteScreenshotGUI:
         )
         full_radio.grid(row=3, column=0, sticky="w", padx=5, pady=5)
         
+        all_radio = ttk.Radiobutton(
+            type_frame, 
+            text="All Formats (one page load per website)", 
+            variable=self.screenshot_type, 
+            value="all"
+        )
+        all_radio.grid(row=4, column=0, sticky="w", padx=5, pady=5)
+        
+        # Parallel workers
+        ttk.Label(type_frame, text="Parallel browsers:").grid(row=5, column=0, sticky="w", padx=5, pady=5)
+        workers_entry = ttk.Entry(type_frame, textvariable=self.workers, width=5)
+        workers_entry.grid(row=5, column=1, sticky="w", padx=5, pady=5)
+        
         # Image Processing Options
         process_frame = ttk.LabelFrame(parent, text="Image Processing Options", padding="10")
         process_frame.grid(row=2, column=0, sticky="ew", padx=5, pady=5)
@@ -178,7 +195,7 @@ class WebsiteScreenshotGUI:
     def browse_file(self):
         file_path = filedialog.askopenfilename(
             title="Select URL File",
-            filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")]
+            filetypes=[("Text Files", "*.txt"), ("Compressed Text Files", "*.gz"), ("All Files", "*.*")]
         )
         if file_path:
             self.url_file_path.set(file_path)
@@ -196,37 +213,30 @@ class WebsiteScreenshotGUI:
         
         # Count total URLs for progress tracking
         try:
-            with open(self.url_file_path.get(), 'r') as f:
-                urls = [line.strip() for line in f.readlines() if line.strip()]
-            self.total_urls = len(urls)
-            self.processed_urls = 0
+            # Streamed so huge (or .gz) lists are never loaded into memory
+            self.total_urls = count_urls(self.url_file_path.get())
+            self.processed_urls = set()
             self.log_text.insert(tk.END, f"Found {self.total_urls} URLs to process.\n")
         except Exception as e:
             self.log_text.insert(tk.END, f"Error reading URL file: {e}\n")
             self.processing_active = False
             return
         
-        # Determine which script to run
-        if self.screenshot_type.get() == "regular":
-            script_name = "website_screenshot.py"
-            output_dir_base = "screenshots"
-        elif self.screenshot_type.get() == "widescreen":
-            script_name = "website_screenshot_widescreen.py"
-            output_dir_base = "screenshots_widescreen"
-        elif self.screenshot_type.get() == "fourbythree":
-            script_name = "website_screenshot_fourbythree.py"
-            output_dir_base = "screenshots_fourbythree"
-        else:  # "full"
-            script_name = "website_screenshot_full.py"
-            output_dir_base = "screenshots_full"
-        
-        # For widescreen mode, we need to create the script if it doesn't exist
-        if self.screenshot_type.get() == "widescreen" and not os.path.exists(script_name):
-            self.create_widescreen_script()
-            
-        # For 4:3 mode, we need to create the script if it doesn't exist
-        if self.screenshot_type.get() == "fourbythree" and not os.path.exists(script_name):
-            self.create_fourbythree_script()
+        # All screenshot types are viewport profiles of the same script
+        profiles = {
+            "regular": "square",
+            "widescreen": "widescreen",
+            "fourbythree": "fourbythree",
+            "full": "full",
+            "all": "square,widescreen,fourbythree,full",
+        }[self.screenshot_type.get()]
+        script_name = "website_screenshot.py"
+        output_dir_base = "screenshots_multi" if "," in profiles else {
+            "square": "screenshots",
+            "widescreen": "screenshots_widescreen",
+            "fourbythree": "screenshots_fourbythree",
+            "full": "screenshots_full",
+        }[profiles]
         
         # Check if the script exists
         if not os.path.exists(script_name):
@@ -242,83 +252,15 @@ class WebsiteScreenshotGUI:
         # Create and start thread
         self.process_thread = threading.Thread(
             target=self.run_process,
-            args=(script_name, self.url_file_path.get(), output_dir_base),
+            args=(script_name, self.url_file_path.get(), output_dir_base, profiles),
             daemon=True
         )
         self.process_thread.start()
     
-    def create_widescreen_script(self):
-        """Create the widescreen screenshot script based on the regular one"""
-        try:
-            # Check if the regular script exists
-            if not os.path.exists("website_screenshot.py"):
-                self.log_text.insert(tk.END, "Error: Cannot create widescreen script, website_screenshot.py not found.\n")
-                return False
-            
-            # Read the regular script
-            with open("website_screenshot.py", 'r') as f:
-                script_content = f.read()
-            
-            # Modify for widescreen (1920x1080)
-            script_content = script_content.replace(
-                'chrome_options.add_argument("--window-size=1920,1920")',
-                'chrome_options.add_argument("--window-size=1920,1080")'
-            )
-            
-            # Replace output directory
-            script_content = script_content.replace(
-                'output_dir = os.path.join(os.getcwd(), "screenshots", timestamp)',
-                'output_dir = os.path.join(os.getcwd(), "screenshots_widescreen", timestamp)'
-            )
-            
-            # Write to new file
-            with open("website_screenshot_widescreen.py", 'w') as f:
-                f.write(script_content)
-            
-            self.log_text.insert(tk.END, "Created widescreen screenshot script.\n")
-            return True
-        except Exception as e:
-            self.log_text.insert(tk.END, f"Error creating widescreen script: {e}\n")
-            return False
-            
-    def create_fourbythree_script(self):
-        """Create the 4:3 aspect ratio screenshot script based on the regular one"""
-        try:
-            # Check if the regular script exists
-            if not os.path.exists("website_screenshot.py"):
-                self.log_text.insert(tk.END, "Error: Cannot create 4:3 script, website_screenshot.py not found.\n")
-                return False
-            
-            # Read the regular script
-            with open("website_screenshot.py", 'r') as f:
-                script_content = f.read()
-            
-            # Modify for 4:3 aspect ratio (1920x1440)
-            script_content = script_content.replace(
-                'chrome_options.add_argument("--window-size=1920,1920")',
-                'chrome_options.add_argument("--window-size=1920,1440")'
-            )
-            
-            # Replace output directory
-            script_content = script_content.replace(
-                'output_dir = os.path.join(os.getcwd(), "screenshots", timestamp)',
-                'output_dir = os.path.join(os.getcwd(), "screenshots_fourbythree", timestamp)'
-            )
-            
-            # Write to new file
-            with open("website_screenshot_fourbythree.py", 'w') as f:
-                f.write(script_content)
-            
-            self.log_text.insert(tk.END, "Created 4:3 aspect ratio screenshot script.\n")
-            return True
-        except Exception as e:
-            self.log_text.insert(tk.END, f"Error creating 4:3 aspect ratio script: {e}\n")
-            return False
-    
-    def run_process(self, script_name, url_file, output_dir_base):
+    def run_process(self, script_name, url_file, output_dir_base, profiles):
         try:
             # Start process
-            cmd = f'python "{script_name}" "{url_file}"'
+            cmd = f'python "{script_name}" "{url_file}" --profiles {profiles} --workers {max(1, self.workers.get())}'
             
             self.process = subprocess.Popen(
                 cmd,
@@ -341,8 +283,8 @@ class WebsiteScreenshotGUI:
                 
                 # Update progress based on output
                 if "Processing:" in line:
-                    self.processed_urls += 1
-                    progress = (self.processed_urls / self.total_urls) * 100
+                    self.processed_urls.add(line.split("Processing:", 1)[1].strip())
+                    progress = min(100.0, (len(self.processed_urls) / self.total_urls) * 100)
                     self.progress_var.set(progress)
                 
                 # Extract output directory from log
@@ -427,7 +369,7 @@ class WebsiteScreenshotGUI:
             latest_dirs = {}
             latest_times = {}
             
-            for dir_base in ["screenshots", "screenshots_full", "screenshots_widescreen", "screenshots_fourbythree"]:
+            for dir_base in ["screenshots", "screenshots_full", "screenshots_widescreen", "screenshots_fourbythree", "screenshots_multi"]:
                 latest_dir = find_latest_dir(dir_base)
                 if latest_dir:
                     latest_dirs[dir_base] = latest_dir
@@ -450,135 +392,28 @@ class WebsiteScreenshotGUI:
         self.queue.put(f"- Width: {self.resize_width.get()}\n")
         self.queue.put(f"- WebP: {self.save_webp.get()}\n\n")
         
-        # Create a temporary script file for processing
-        script_content = """
-import os
-import glob
-import sys
-from PIL import Image
-
-def process_images(folder_path, resize=True, resize_width=800, save_webp=True):
-    print(f"Processing images in folder: {folder_path}")
-    print(f"- Resize: {resize} (width={resize_width})")
-    print(f"- WebP conversion: {save_webp}")
-    
-    if not os.path.exists(folder_path):
-        print(f"Error: Folder {folder_path} does not exist.")
-        return
-    
-    # Get all PNG images in the folder
-    png_files = glob.glob(os.path.join(folder_path, "*.png"))
-    print(f"Found {len(png_files)} PNG images to process.")
-    
-    if len(png_files) == 0:
-        print("No images to process.")
-        return
-    
-    # Process for resizing
-    if resize:
-        # Create resized directory
-        resized_dir = os.path.join(folder_path, "resized")
-        os.makedirs(resized_dir, exist_ok=True)
-        print(f"Created resized directory: {resized_dir}")
-        
-        # Process each image for resizing
-        for img_path in png_files:
-            img_filename = os.path.basename(img_path)
-            resized_path = os.path.join(resized_dir, img_filename)
-            
-            try:
-                # Open and resize the image
-                img = Image.open(img_path)
-                
-                # Calculate new height to maintain aspect ratio
-                width_percent = (resize_width / float(img.size[0]))
-                target_height = int((float(img.size[1]) * float(width_percent)))
-                
-                # Resize with LANCZOS resampling for quality
-                resized_img = img.resize((resize_width, target_height), Image.LANCZOS)
-                resized_img.save(resized_path)
-                
-                print(f"Resized: {img_filename} to {resize_width}x{target_height}")
-                img.close()
-            except Exception as e:
-                print(f"Error resizing {img_filename}: {e}")
-    
-    # Process for WebP conversion
-    if save_webp:
-        # Create WebP directory
-        webp_dir = os.path.join(folder_path, "webp")
-        os.makedirs(webp_dir, exist_ok=True)
-        print(f"Created WebP directory: {webp_dir}")
-        
-        # Determine source files (original or resized)
-        source_files = []
-        if resize:
-            source_dir = os.path.join(folder_path, "resized")
-            source_files = glob.glob(os.path.join(source_dir, "*.png"))
-        else:
-            source_files = png_files
-        
-        # Convert each image to WebP
-        for img_path in source_files:
-            img_filename = os.path.basename(img_path)
-            webp_filename = os.path.splitext(img_filename)[0] + ".webp"
-            webp_path = os.path.join(webp_dir, webp_filename)
-            
-            try:
-                # Open and convert the image
-                img = Image.open(img_path)
-                
-                # If resize is not already applied but is requested
-                if not resize and resize_width > 0:
-                    # Calculate new height to maintain aspect ratio
-                    width_percent = (resize_width / float(img.size[0]))
-                    target_height = int((float(img.size[1]) * float(width_percent)))
-                    
-                    # Resize with LANCZOS resampling for quality
-                    img = img.resize((resize_width, target_height), Image.LANCZOS)
-                
-                # Save as WebP with good quality
-                img.save(webp_path, format="WEBP", quality=90)
-                
-                print(f"Converted to WebP: {webp_filename}")
-                img.close()
-            except Exception as e:
-                print(f"Error converting {img_filename} to WebP: {e}")
-    
-    print("Image processing completed.")
-    print("\\n==== COMPLETED ====\\n")  # Special marker for completion
-
-if __name__ == "__main__":
-    resize = sys.argv[2].lower() == "true"
-    resize_width = int(sys.argv[3])
-    save_webp = sys.argv[4].lower() == "true"
-    
-    process_images(sys.argv[1], resize, resize_width, save_webp)
-"""
-        
-        # Create a temporary script file
-        temp_script_path = os.path.join(os.getcwd(), "temp_image_processor.py")
-        with open(temp_script_path, "w") as f:
-            f.write(script_content)
-        
-        # Run the script in a separate process with parameters from the UI
+        # Run the standalone image processor in a separate process with parameters from the UI
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "process_last_screenshots.py")
         cmd = [
-            sys.executable, 
-            temp_script_path, 
-            directory_to_process, 
-            str(self.resize_images.get()).lower(), 
-            str(self.resize_width.get()), 
-            str(self.save_webp.get()).lower()
+            sys.executable,
+            script_path,
+            directory_to_process,
+            str(self.resize_width.get()),
+            "--batch"
         ]
+        if not self.resize_images.get():
+            cmd.append("--no-resize")
+        if not self.save_webp.get():
+            cmd.append("--no-webp")
         
         # Run in a separate thread
         threading.Thread(
             target=self.run_image_processor,
-            args=(cmd, temp_script_path),
+            args=(cmd,),
             daemon=True
         ).start()
     
-    def run_image_processor(self, cmd, temp_script_path):
+    def run_image_processor(self, cmd):
         """Run the image processor in a separate process"""
         try:
             # Run image processing
@@ -596,7 +431,7 @@ if __name__ == "__main__":
                 self.queue.put(line)
                 
                 # Check for completion marker
-                if "==== COMPLETED ====" in line:
+                if "Image processing completed." in line:
                     # Update progress to 100%
                     self.progress_var.set(100.0)
                     self.root.update_idletasks()
@@ -604,12 +439,6 @@ if __name__ == "__main__":
             # Wait for process to complete
             process.wait()
             
-            # Clean up
-            try:
-                os.remove(temp_script_path)
-            except:
-                pass
-                
             # Set progress to 100%
             self.queue.put("\nImage processing completed.\n")
             self.progress_var.set(100.0)
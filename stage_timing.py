@@ -0,0 +1,63 @@
+"""Per-URL stage timings and the percentile report in summary.txt.
+
+Every URL is timed per stage and the timings (in seconds) are stored in the
+URL's record, so they end up as a "timings" object on its line in
+journal.jsonl. TimingReport turns those lines into p50/p90/p99 per stage.
+"""
+import time
+from array import array
+from contextlib import contextmanager
+
+# Stages in the order they happen for one URL
+STAGES = ("launch", "navigation", "wait", "initial", "final", "hash", "write")
+
+class StageTimer:
+    """Adds the duration of each timed block to record["timings"]."""
+
+    def __init__(self, record):
+        self.timings = record.setdefault("timings", {})
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; repeated blocks of the same stage are summed."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed, 4)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil without floats
+    return sorted_values[int(rank) - 1]
+
+class TimingReport:
+    """Collects stage timings of many URLs and reports their percentiles."""
+
+    def __init__(self):
+        # Compact arrays of doubles instead of lists of float objects
+        self.values = {stage: array('d') for stage in STAGES}
+
+    def add(self, timings):
+        for stage, seconds in (timings or {}).items():
+            self.values.setdefault(stage, array('d')).append(seconds)
+
+    def percentiles(self, pcts=(50, 90, 99)):
+        """Return {stage: {pct: seconds}} for every stage with timings."""
+        report = {}
+        for stage, values in self.values.items():
+            if values:
+                ordered = sorted(values)
+                report[stage] = {pct: percentile(ordered, pct) for pct in pcts}
+        return report
+
+    def summary_lines(self):
+        """Lines for summary.txt, one per stage."""
+        lines = []
+        for stage, values in self.percentiles().items():
+            lines.append(f"  {stage}: p50 {values[50]:.2f}s, p90 {values[90]:.2f}s, p99 {values[99]:.2f}s "
+                         f"({len(self.values[stage])} attempts)")
+        return lines
@@ -0,0 +1,108 @@
+"""Page load and settle times per URL and host, kept across runs to size each URL's budgets.
+
+Every captured URL adds its navigation and wait stage times to its own
+history and to its host's (the full host name, so foo.github.io and
+bar.github.io are kept apart) in timing_history.json, the last SAMPLES of
+each. A URL with at least MIN_SAMPLES of its own is sized from those, else
+from its host's once the host has MIN_SAMPLES: the page load timeout and
+wait budget become p95 x MARGIN instead of the fixed defaults, so fast
+sites stop waiting sooner and sites that keep timing out get more time,
+up to PAGE_LOAD_CEILING. The wait budget never exceeds --max-wait.
+"""
+import os
+import json
+import threading
+from urllib.parse import urlsplit
+from url_source import normalize_url
+from stage_timing import percentile
+
+HISTORY_FILE = "timing_history.json"
+# Most recent samples kept per URL or host and stage
+SAMPLES = 20
+MIN_SAMPLES = 3
+MARGIN = 1.5
+# URLs and hosts kept in the file, least recently captured are dropped first
+MAX_ENTRIES = 100000
+PAGE_LOAD_FLOOR = 10.0
+PAGE_LOAD_CEILING = 120.0
+WAIT_FLOOR = 2.0
+
+def history_keys(url):
+    """(URL key, host key) that url's samples are kept under.
+
+    URL keys are normalized URLs and always contain "://", host keys never do.
+    """
+    key = normalize_url(url)
+    try:
+        return key, urlsplit(key).hostname or key
+    except ValueError:
+        return key, key
+
+class TimingHistory:
+    """Thread-safe per-URL and per-host timing history and the budgets derived from it."""
+
+    def __init__(self, path, page_load_timeout=60, max_wait=15.0, margin=MARGIN):
+        self.path = path
+        self.page_load_timeout = page_load_timeout
+        self.max_wait = max_wait
+        self.margin = margin
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def _budget(self, entries, stage, floor, ceiling, default):
+        # The URL's own samples first, then its host's
+        for entry in entries:
+            samples = entry.get(stage)
+            if samples and len(samples) >= MIN_SAMPLES:
+                p95 = percentile(sorted(samples), 95)
+                return round(min(ceiling, max(floor, p95 * self.margin)), 1)
+        return default
+
+    def budgets(self, url):
+        """(page load timeout, wait budget) in seconds for url."""
+        with self.lock:
+            entries = [self.entries.get(key, {}) for key in history_keys(url)]
+            page_load = self._budget(entries, "navigation", PAGE_LOAD_FLOOR, PAGE_LOAD_CEILING,
+                                     self.page_load_timeout)
+            wait = self._budget(entries, "wait", min(WAIT_FLOOR, self.max_wait), self.max_wait, self.max_wait)
+        return page_load, wait
+
+    def record(self, url, record):
+        """Add the navigation and wait times from a URL's record."""
+        timings = record.get("timings") or {}
+        if "navigation" not in timings and "wait" not in timings:
+            # Nothing to learn from, e.g. a URL the preflight found unreachable
+            return
+        with self.lock:
+            for key in set(history_keys(url)):
+                # Re-inserted so the least recently captured entries come first
+                entry = self.entries.pop(key, {})
+                for stage in ("navigation", "wait"):
+                    if stage in timings:
+                        samples = entry.setdefault(stage, [])
+                        samples.append(round(timings[stage], 2))
+                        del samples[:-SAMPLES]
+                self.entries[key] = entry
+
+    def save(self):
+        """Write the history atomically."""
+        with self.lock:
+            for key in list(self.entries)[:max(0, len(self.entries) - MAX_ENTRIES)]:
+                del self.entries[key]
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
@@ -0,0 +1,117 @@
+"""Lazy URL input from plain text files, .gz files or stdin.
+
+URLs are read one line at a time and handed to the capture queue as they
+are read, so very large lists start capturing right away. Duplicates are
+detected with a set of 64-bit hashes of the normalized URL instead of the
+URL strings themselves, which keeps memory small for multi-million-line
+lists.
+"""
+import io
+import sys
+import gzip
+import hashlib
+from urllib.parse import urlsplit
+
+def open_url_file(path):
+    """Open a URL list for reading text: '-' is stdin, *.gz is decompressed on the fly."""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def normalize_url(url):
+    """Canonical form of a URL used to detect duplicates.
+
+    The scheme defaults to https, scheme and host are lower-cased, and a
+    bare trailing slash and any #fragment are dropped.
+    """
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    path = parts.path if parts.path not in ('', '/') else ''
+    query = f"?{parts.query}" if parts.query else ''
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}{query}"
+
+def url_key(url):
+    """64-bit hash of the normalized URL."""
+    digest = hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+class UrlSet:
+    """Membership set of URLs that stores only a 64-bit hash per URL."""
+
+    def __init__(self, urls=()):
+        self.keys = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        """Add a URL; returns False if it was already present."""
+        key = url_key(url)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def discard(self, url):
+        """Remove a URL if present."""
+        self.keys.discard(url_key(url))
+
+    def __contains__(self, url):
+        return url_key(url) in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+class UrlSource:
+    """Iterate over the unique URLs of a list without loading it into memory.
+
+    Blank lines and lines starting with '#' are ignored. `count` and
+    `duplicates` are updated while iterating.
+    """
+
+    def __init__(self, path, dedupe=True):
+        self.path = path
+        self.dedupe = dedupe
+        self.file = None
+        self.seen = UrlSet()
+        self.count = 0
+        self.duplicates = 0
+
+    def __enter__(self):
+        self.file = open_url_file(self.path)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.file is not None and self.path != '-':
+            self.file.close()
+        self.file = None
+
+    def __iter__(self):
+        if self.file is None:
+            with self:
+                yield from self._read()
+        else:
+            yield from self._read()
+
+    def _read(self):
+        for line in self.file:
+            url = line.strip()
+            if not url or url.startswith('#'):
+                continue
+            if self.dedupe and not self.seen.add(url):
+                self.duplicates += 1
+                continue
+            self.count += 1
+            yield url
+
+def count_urls(path):
+    """Number of unique URLs in a list, read in a streaming fashion."""
+    source = UrlSource(path)
+    for _ in source:
+        pass
+    return source.count
@@ -9,10 +9,28 @@ import subprocess
 import json
 import shutil
 import traceback
-from selenium import webdriver
+import argparse
+import tempfile
+from contextlib import nullcontext
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import WebDriverException, TimeoutException
+from browser_session import BrowserSession
+from driver_cache import DriverCache, get_platform_name
+from run_journal import RunJournal, load_completed, iter_entries, iter_final_entries
+from url_source import UrlSource
+from stage_timing import StageTimer, TimingReport
+from capture_pool import run_capture_pool
+from page_ready import PageWait
+from full_page import capture_full_page, DEFAULT_MAX_PIXELS
+from image_pipeline import ImageWriter, ImagePipeline, parse_outputs, DUPLICATE_MODES
+from image_hash import dhash, hash_hex
+from blob_store import BlobStore
+from request_blocking import RequestBlocker, load_patterns, parse_resource_types
+from browser_cache import BrowserCache, DEFAULT_CACHE_SIZE_MB
+from host_scheduler import DEFAULT_MAX_PER_HOST
+from timing_history import TimingHistory, HISTORY_FILE
+from retry_queue import RetryQueue, DEFAULT_MAX_RETRIES, DEFAULT_BACKOFF
+from preflight import Preflight, UnreachableError, chrome_error, DEFAULT_TIMEOUT as DEFAULT_PREFLIGHT_TIMEOUT
 
 def sanitize_filename(url):
     """Convert URL to a valid filename by removing special characters."""
@@ -125,12 +143,23 @@ def get_chrome_version(chrome_path):
     
     return None
 
-def get_latest_driver_version():
-    """Get the latest version from Chrome for Testing JSON API."""
+def get_latest_driver_version(major_version=None):
+    """Get the newest driver version for a Chrome major version (or the latest stable)."""
+    if major_version:
+        try:
+            url = f"https://googlechromelabs.github.io/chrome-for-testing/LATEST_RELEASE_{major_version}"
+            with urllib.request.urlopen(url, timeout=30) as response:
+                version = response.read().decode('utf-8').strip()
+            if version:
+                print(f"Found ChromeDriver {version} for Chrome {major_version}")
+                return version
+        except Exception as e:
+            print(f"Error getting driver version for Chrome {major_version}: {e}")
+    
     try:
         # Get the latest version from the Chrome for Testing API
         url = "https://googlechromelabs.github.io/chrome-for-testing/last-known-good-versions.json"
-        with urllib.request.urlopen(url) as response:
+        with urllib.request.urlopen(url, timeout=30) as response:
             data = json.loads(response.read().decode('utf-8'))
             
         # Get the stable version
@@ -145,216 +174,404 @@ def get_latest_driver_version():
     # Fallback version if we can't get the latest
     return "124.0.6367.0"  # Known working version
 
-def get_chromedriver_url(chrome_version):
-    """Get the appropriate ChromeDriver URL for the installed Chrome version."""
-    try:
-        # Get major version
-        major_version = chrome_version.split('.')[0]
-        print(f"Using Chrome major version: {major_version}")
-        
-        # Get the latest compatible version from the Chrome for Testing API
-        latest_version = get_latest_driver_version()
-        
-        # Platform detection
-        platform_name = None
-        if platform.system() == 'Windows':
-            platform_name = "win64"
-        elif platform.system() == 'Linux':
-            platform_name = "linux64"
-        elif platform.system() == 'Darwin':
-            if platform.machine() == 'arm64':  # M1/M2 Mac
-                platform_name = "mac-arm64"
-            else:
-                platform_name = "mac-x64"
-                
-        # New URL format
-        download_url = f"https://storage.googleapis.com/chrome-for-testing-public/{latest_version}/{platform_name}/chromedriver-{platform_name}.zip"
-        print(f"Using Chrome for Testing URL: {download_url}")
-        return download_url
-            
-    except Exception as e:
-        print(f"Error determining ChromeDriver URL: {e}")
-        # Use a known working version as fallback
-        if platform.system() == 'Windows':
-            return "https://storage.googleapis.com/chrome-for-testing-public/124.0.6367.0/win64/chromedriver-win64.zip"
-        elif platform.system() == 'Linux':
-            return "https://storage.googleapis.com/chrome-for-testing-public/124.0.6367.0/linux64/chromedriver-linux64.zip"
-        elif platform.system() == 'Darwin':
-            if platform.machine() == 'arm64':  # M1/M2 Mac
-                return "https://storage.googleapis.com/chrome-for-testing-public/124.0.6367.0/mac-arm64/chromedriver-mac-arm64.zip"
-            else:
-                return "https://storage.googleapis.com/chrome-for-testing-public/124.0.6367.0/mac-x64/chromedriver-mac-x64.zip"
+def get_chromedriver_url(driver_version, platform_name):
+    """Chrome for Testing download URL of a ChromeDriver version."""
+    return f"https://storage.googleapis.com/chrome-for-testing-public/{driver_version}/{platform_name}/chromedriver-{platform_name}.zip"
 
 def download_chromedriver(chrome_version):
-    """Download and setup ChromeDriver based on Chrome version."""
-    current_platform = platform.system().lower()
+    """Return a ChromeDriver matching the Chrome version.
     
-    # Create drivers directory if it doesn't exist
-    driver_dir = os.path.join(os.getcwd(), 'drivers')
-    os.makedirs(driver_dir, exist_ok=True)
+    Drivers are cached per Chrome major version and platform in drivers/,
+    so the network is only used when no intact cached driver exists.
+    """
+    major_version = chrome_version.split('.')[0]
+    platform_name = get_platform_name()
+    if not platform_name:
+        print(f"Unsupported platform: {platform.system()}")
+        return None
     
-    # Path to chromedriver
-    chromedriver_path = os.path.join(driver_dir, 'chromedriver.exe' if current_platform == 'windows' else 'chromedriver')
+    driver_dir = os.path.join(os.getcwd(), 'drivers')
+    cache = DriverCache(driver_dir)
     
-    # Get ChromeDriver download URL
-    download_url = get_chromedriver_url(chrome_version)
-    if not download_url:
-        print("Failed to determine ChromeDriver download URL")
-        return None
+    cached_path = cache.lookup(major_version, platform_name)
+    if cached_path:
+        print(f"Using cached ChromeDriver for Chrome {major_version} ({platform_name})")
+        return cached_path
     
+    print(f"No cached ChromeDriver for Chrome {major_version} ({platform_name}), downloading it")
+    driver_version = get_latest_driver_version(major_version)
+    download_url = get_chromedriver_url(driver_version, platform_name)
     print(f"Using ChromeDriver download URL: {download_url}")
     
+    os.makedirs(driver_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix='chromedriver-', dir=driver_dir)
     try:
         # Download ChromeDriver
         print("Downloading ChromeDriver...")
-        zip_path = os.path.join(driver_dir, 'chromedriver.zip')
+        zip_path = os.path.join(temp_dir, 'chromedriver.zip')
         urllib.request.urlretrieve(download_url, zip_path)
         
-        # Extract ChromeDriver
+        # Extract ChromeDriver, checking the archive first
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Check if the zip contains a directory structure (newer Chrome versions)
-            file_list = zip_ref.namelist()
-            has_directory = any('/' in name for name in file_list)
-            
-            if has_directory:
-                # Extract all files to temporary directory
-                temp_dir = os.path.join(driver_dir, 'temp')
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                os.makedirs(temp_dir, exist_ok=True)
-                zip_ref.extractall(temp_dir)
-                
-                # Find the chromedriver executable
-                chromedriver_exe = None
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file == 'chromedriver.exe' or file == 'chromedriver':
-                            chromedriver_exe = os.path.join(root, file)
-                            break
-                    if chromedriver_exe:
-                        break
-                
-                if chromedriver_exe:
-                    # Copy to final location
-                    if os.path.exists(chromedriver_path):
-                        os.remove(chromedriver_path)
-                    shutil.copy(chromedriver_exe, chromedriver_path)
-                    print(f"Copied ChromeDriver from {chromedriver_exe} to {chromedriver_path}")
-                else:
-                    print("Could not find chromedriver in the extracted files")
-                    print("Files found:", os.listdir(temp_dir))
-                    return None
-                    
-                # Clean up temp directory
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            else:
-                # Direct extraction for older versions
-                if os.path.exists(chromedriver_path):
-                    os.remove(chromedriver_path)
-                zip_ref.extractall(driver_dir)
+            bad_file = zip_ref.testzip()
+            if bad_file:
+                print(f"Downloaded ChromeDriver archive is corrupt ({bad_file})")
+                return None
+            zip_ref.extractall(temp_dir)
         
-        # Make executable on Unix-like systems
-        if current_platform != 'windows':
-            os.chmod(chromedriver_path, 0o755)
+        # Find the chromedriver executable (newer archives contain a directory)
+        chromedriver_exe = None
+        for root, dirs, files in os.walk(temp_dir):
+            for file in files:
+                if file == 'chromedriver.exe' or file == 'chromedriver':
+                    chromedriver_exe = os.path.join(root, file)
+                    break
+            if chromedriver_exe:
+                break
         
-        # Clean up
-        os.remove(zip_path)
+        if not chromedriver_exe:
+            print("Could not find chromedriver in the extracted files")
+            print("Files found:", os.listdir(temp_dir))
+            return None
         
+        chromedriver_path = cache.store(major_version, platform_name, driver_version, chromedriver_exe)
+        print(f"Cached ChromeDriver {driver_version} at {chromedriver_path}")
         print("ChromeDriver setup complete.")
         return chromedriver_path
     except Exception as e:
         print(f"Error setting up ChromeDriver: {e}")
         return None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-def take_screenshot(url, output_dir, chromedriver_path, chrome_path=None):
-    """Take two screenshots of the website and save them."""
-    sanitized_url = sanitize_filename(url)
-    full_url = ensure_protocol(url)
-    initial_output_path = os.path.join(output_dir, f"{sanitized_url}_initial.png")
-    final_output_path = os.path.join(output_dir, f"{sanitized_url}_final.png")
-    success = False
+# Page load timeout in seconds; full-page pages tend to be long and get more time
+PAGE_LOAD_TIMEOUT = 60
+FULL_PAGE_LOAD_TIMEOUT = 90
+
+# Named viewport profiles. A height of None means the full page height.
+VIEWPORT_PROFILES = {
+    "square": {"width": 1920, "height": 1920, "output_base": "screenshots", "suffix": "",
+               "page_load_timeout": PAGE_LOAD_TIMEOUT},
+    "widescreen": {"width": 1920, "height": 1080, "output_base": "screenshots_widescreen", "suffix": "",
+                   "page_load_timeout": PAGE_LOAD_TIMEOUT},
+    "fourbythree": {"width": 1920, "height": 1440, "output_base": "screenshots_fourbythree", "suffix": "",
+                    "page_load_timeout": PAGE_LOAD_TIMEOUT},
+    "full": {"width": 1920, "height": None, "output_base": "screenshots_full", "suffix": "_full",
+             "page_load_timeout": FULL_PAGE_LOAD_TIMEOUT},
+}
+
+# Older names used by the GUI and batch files
+PROFILE_ALIASES = {"regular": "square", "16:9": "widescreen", "4:3": "fourbythree", "full-page": "full"}
+
+# Minimum height of full-page screenshots
+MIN_FULL_PAGE_HEIGHT = 1080
+
+def resolve_profiles(names, max_pixels=DEFAULT_MAX_PIXELS):
+    """Turn a comma-separated list of profile names into profile dicts.
     
-    print(f"Processing: {url}")
+    Besides the names in VIEWPORT_PROFILES a custom WIDTHxHEIGHT size is
+    accepted. When several profiles are captured in one run each file gets
+    the profile name as suffix so they can share one output folder.
+    Full-page profiles above max_pixels are captured in tiles.
+    """
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    
+    profiles = []
+    for name in names:
+        name = PROFILE_ALIASES.get(name.lower(), name.lower())
+        if name in VIEWPORT_PROFILES:
+            profile = dict(VIEWPORT_PROFILES[name], name=name)
+        else:
+            match = re.fullmatch(r'(\d+)x(\d+)', name)
+            if not match:
+                raise ValueError(f"Unknown viewport profile '{name}'. Use one of {', '.join(VIEWPORT_PROFILES)} or WIDTHxHEIGHT.")
+            profile = {"name": name, "width": int(match.group(1)), "height": int(match.group(2)),
+                       "output_base": f"screenshots_{name}", "suffix": "", "page_load_timeout": PAGE_LOAD_TIMEOUT}
+        profiles.append(profile)
+    
+    if not profiles:
+        raise ValueError("At least one viewport profile is required.")
+    
+    for profile in profiles:
+        profile["file_suffix"] = profile["suffix"] if len(profiles) == 1 else f"_{profile['name']}"
+        profile["max_pixels"] = max_pixels
+    return profiles
+
+def profiles_output_base(profiles):
+    """Folder that holds the timestamped run folders for these profiles."""
+    return profiles[0]["output_base"] if len(profiles) == 1 else "screenshots_multi"
+
+def profiles_page_load_timeout(profiles):
+    """Page load timeout for one page load that captures all these profiles."""
+    return max(profile["page_load_timeout"] for profile in profiles)
+
+def viewport_size(profile):
+    """Window size for a profile (full-page profiles start at the minimum height)."""
+    return profile["width"], profile["height"] or MIN_FULL_PAGE_HEIGHT
+
+def screenshot_path(output_dir, sanitized_url, stage, profile):
+    """Path of the initial/final screenshot of a URL for one profile."""
+    return os.path.join(output_dir, f"{sanitized_url}_{stage}{profile['file_suffix']}.png")
+
+def set_viewport(driver, width, height):
+    """Resize the page viewport without resizing the browser window."""
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride",
+                           {"width": width, "height": height, "deviceScaleFactor": 1, "mobile": False})
+
+def capture_profile(driver, profile):
+    """Resize the viewport for a profile and return a screenshot as PNG bytes.
+    
+    Full-page profiles are captured through DevTools without resizing the
+    window (see full_page.py).
+    """
+    width, height = viewport_size(profile)
+    if profile["height"] is None:
+        png, height = capture_full_page(driver.execute_cdp_cmd,
+                                        lambda expression: driver.execute_script(f"return ({expression});"),
+                                        width, MIN_FULL_PAGE_HEIGHT, profile["max_pixels"])
+        print(f"Page dimensions: {width}x{height}")
+        return png
+    set_viewport(driver, width, height)
+    return driver.get_screenshot_as_png()
+
+def save_screenshot(writer, record, timer, path, png, initial=None):
+    """Hash and save one screenshot and add it to the URL's record.
+    
+    For a final screenshot `initial` is the (path, hash) of the initial
+    screenshot of the same profile, so the writer can drop or link it if
+    the two match. Returns the screenshot's perceptual hash.
+    """
+    name = os.path.basename(path)
+    with timer.stage("hash"):
+        image_hash = dhash(png)
+    record.setdefault("hashes", {})[name] = hash_hex(image_hash)
+    with timer.stage("write"):
+        if initial is None:
+            writer.write(path, png)
+            outcome = "saved"
+        else:
+            outcome = writer.write_final(initial[0], path, png, initial[1], image_hash)
+    
+    stage = "Initial" if initial is None else "Final"
+    if outcome == "dropped":
+        print(f"{stage} screenshot matches the initial one, not saved: {path}")
+    elif outcome == "linked":
+        print(f"{stage} screenshot matches the initial one, linked to: {initial[0]}")
+    else:
+        print(f"{stage} screenshot saved to: {path}")
+    if outcome != "saved":
+        record.setdefault("duplicates", []).append(name)
+    if outcome != "dropped":
+        record["files"].append(name)
+    return image_hash
+
+def build_chrome_options(chrome_path=None, profiles=None, blocker=None, extra_args=()):
+    """Build the Chrome options used for every browser session."""
+    if profiles is None:
+        profiles = resolve_profiles("square")
+    width, height = viewport_size(profiles[0])
     
-    # Configure Chrome options
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")  # Updated for Chrome 115+
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1920")  # Square viewport at larger resolution
+    chrome_options.add_argument(f"--window-size={width},{height}")  # Viewport of the first profile
     chrome_options.add_argument("--ignore-certificate-errors")  # Ignore SSL errors
+    for argument in extra_args:
+        chrome_options.add_argument(argument)
     
     if chrome_path:
         chrome_options.binary_location = chrome_path
     
+    if blocker:
+        # Blocked requests are counted from the network events in the performance log
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    
+    return chrome_options
+
+def take_screenshot(url, output_dir, chromedriver_path, chrome_path=None, session=None, wait=None, profiles=None, record=None,
+                    writer=None, blocker=None, history=None):
+    """Take initial and final screenshots of the website for each viewport profile.
+    
+    All profiles are captured from a single page load by resizing the
+    viewport between screenshots. If a BrowserSession is given its driver is
+    reused, otherwise a one-off browser is started and shut down for this
+    URL. `wait` is the PageWait used before the final screenshots
+    (readiness-based by default). Details such as the saved files, any
+    error and the per-stage timings are added to the `record` dict for the
+    run journal. Screenshots are saved through `writer` (an ImageWriter),
+    which encodes the captured PNG bytes into the requested formats. With
+    a RequestBlocker (which the session must have applied, see
+    process_websites) the number of blocked requests is recorded too. A
+    page that fails to load (Chrome's error page) is not captured and
+    counts as failed. A TimingHistory sets this URL's page load timeout
+    and wait budget from earlier captures of its domain.
+    """
+    sanitized_url = sanitize_filename(url)
+    full_url = ensure_protocol(url)
+    success = False
+    healthy = True
+    if wait is None:
+        wait = PageWait()
+    if profiles is None:
+        profiles = resolve_profiles("square")
+    if record is None:
+        record = {}
+    if writer is None:
+        writer = ImageWriter()
+    record["files"] = []
+    timer = StageTimer(record)
+    max_wait = None
+    if history:
+        page_load_timeout, max_wait = history.budgets(url)
+        record["budgets"] = {"page_load": page_load_timeout, "wait": max_wait}
+    
+    print(f"Processing: {url}")
+    
+    own_session = session is None
+    if own_session:
+        session = BrowserSession(chromedriver_path, lambda: build_chrome_options(chrome_path, profiles, blocker),
+                                 max_uses=1, page_load_timeout=profiles_page_load_timeout(profiles),
+                                 on_start=lambda driver: blocker.apply(driver.execute_cdp_cmd) if blocker else None)
+    
     try:
-        # Initialize the Chrome driver
-        service = Service(executable_path=chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Set page load timeout to 60 seconds for larger screenshots
-        driver.set_page_load_timeout(60)
+        # Get a driver from the session (starts Chrome if needed)
+        with timer.stage("launch"):
+            driver = session.acquire()
+            if blocker:
+                # Discard the log of the previous URL
+                blocker.blocked(driver)
         
         try:
             # Navigate to the URL
-            driver.get(full_url)
+            with timer.stage("navigation"):
+                if history:
+                    driver.set_page_load_timeout(page_load_timeout)
+                driver.get(full_url)
             
-            # Take initial screenshot immediately
-            driver.save_screenshot(initial_output_path)
-            print(f"Initial screenshot saved to: {initial_output_path}")
+            # Don't wait for Chrome's own error page to settle
+            error = chrome_error(driver)
+            if error:
+                raise UnreachableError(error)
             
-            # Flag to track if we have at least the initial screenshot
-            initial_success = True
+            # Take initial screenshots immediately
+            initial_shots = {}
+            for profile in profiles:
+                initial_output_path = screenshot_path(output_dir, sanitized_url, "initial", profile)
+                with timer.stage("initial"):
+                    png = capture_profile(driver, profile)
+                initial_hash = save_screenshot(writer, record, timer, initial_output_path, png)
+                initial_shots[profile["name"]] = (initial_output_path, initial_hash)
+                
+                # At least one initial screenshot counts as a (partial) success
+                success = True
             
-            # Try for the final screenshot
+            # Try for the final screenshots
             try:
-                # Wait longer for the page to fully load (needed for higher resolution)
-                time.sleep(10)
-                
-                # Scroll down and up to ensure all lazy-loaded elements are loaded
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(3)
-                driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(2)
-                
-                # Take final screenshot after everything is loaded
-                driver.save_screenshot(final_output_path)
-                print(f"Final screenshot saved to: {final_output_path}")
+                # Wait for the page to settle at the first profile's size, scrolling
+                # down and up so lazy-loaded elements load
+                with timer.stage("wait"):
+                    set_viewport(driver, *viewport_size(profiles[0]))
+                    wait.settle(driver, max_wait)
                 
-                # Both screenshots succeeded
-                success = True
+                # Take final screenshots after everything is loaded
+                for profile in profiles:
+                    final_output_path = screenshot_path(output_dir, sanitized_url, "final", profile)
+                    with timer.stage("final"):
+                        png = capture_profile(driver, profile)
+                    save_screenshot(writer, record, timer, final_output_path, png, initial_shots[profile["name"]])
             except Exception as final_error:
                 # If we at least got the initial screenshot, log the error but don't lose the initial success
                 print(f"Error taking final screenshot: {final_error}")
-                if initial_success:
-                    # Consider it a partial success if we got at least the initial screenshot
-                    success = True
+                record["error"] = f"final screenshot: {final_error}"
+            
+            if blocker:
+                record["blocked"] = blocker.blocked(driver)
+                print(f"Blocked requests: {record['blocked']['requests']}")
         except Exception as nav_error:
             print(f"Error navigating to URL: {nav_error}")
+            record["error"] = str(nav_error).strip()
             
-    except TimeoutException:
+    except TimeoutException as e:
         print(f"Timeout while loading {url}")
+        record["error"] = str(e).strip()
     except WebDriverException as e:
         print(f"Error accessing {url}: {e}")
+        record["error"] = str(e).strip()
+        healthy = False
     except Exception as e:
         print(f"Unexpected error with {url}: {e}")
         print(traceback.format_exc())
+        record["error"] = str(e).strip()
+        healthy = False
     finally:
-        if 'driver' in locals():
-            try:
-                driver.quit()
-            except:
-                pass
+        if own_session:
+            session.quit()
+        else:
+            # Reset state for the next URL, restarting Chrome if it crashed
+            session.release(healthy)
     
     return success
 
-def process_websites(input_file):
-    """Process all websites from the input file."""
-    # Create a timestamped folder for this run
-    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
-    output_dir = os.path.join(os.getcwd(), "screenshots", timestamp)
-    os.makedirs(output_dir, exist_ok=True)
+def process_websites(input_file, recycle_after=50, workers=1, engine="selenium", tabs=8, wait=None, profiles=None,
+                     resume_dir=None, writer=None, blocker=None, browser_cache=None, max_per_host=DEFAULT_MAX_PER_HOST,
+                     preflight=None, history=None, retries=None):
+    """Process all websites from the input file.
+    
+    input_file may be a plain text file, a .gz file or "-" for stdin; it is
+    read line by line while capturing and duplicate URLs are skipped.
+    
+    With the selenium engine URLs are shared out between `workers` capture
+    workers, each with its own browser session that is restarted every
+    recycle_after URLs (0 keeps it for the whole run). The cdp engine drives
+    up to `tabs` tabs concurrently in a single Chrome instead, restarted
+    the same way and whenever its DevTools connection drops. `wait` is the
+    PageWait used for every URL, `profiles` the viewport profiles (see
+    resolve_profiles) captured from each page load and `writer` the
+    ImageWriter that saves the screenshots. `blocker` is an optional
+    RequestBlocker for ads, trackers and heavy resources and
+    `browser_cache` an optional BrowserCache that keeps each browser's HTTP
+    cache between URLs and runs.
+    
+    At most max_per_host URLs of one domain are captured at the same time,
+    domains are interleaved and URLs of the same domain go to the same
+    browser where possible (0 captures the URLs in list order). With a
+    Preflight, URLs whose host cannot be resolved or connected to are
+    journaled as failed without being sent to a browser. With a
+    TimingHistory every URL's page load timeout and wait budget come from
+    earlier captures of its domain, and this run's times are added to it.
+    URLs that fail with a transient error, including hosts the preflight
+    timed out on, are put on the RetryQueue `retries`, if given, and
+    captured (and checked) again after the main pass.
+    
+    Each finished URL is appended to the run's journal. Passing the folder
+    of an interrupted run as resume_dir continues that run: URLs the journal
+    lists as captured are skipped and all others are (re)tried.
+    """
+    if wait is None:
+        wait = PageWait()
+    if profiles is None:
+        profiles = resolve_profiles("square")
+    if writer is None:
+        writer = ImageWriter()
+    
+    if resume_dir:
+        # Continue an earlier run in its own folder
+        if not os.path.isdir(resume_dir):
+            print(f"Error: Run folder '{resume_dir}' not found.")
+            return
+        output_dir = os.path.abspath(resume_dir)
+        timestamp = os.path.basename(output_dir.rstrip(os.sep))
+        completed = load_completed(output_dir)
+        print(f"Resuming run in {output_dir}: {len(completed)} URLs already captured")
+    else:
+        # Create a timestamped folder for this run
+        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        output_dir = os.path.join(os.getcwd(), profiles_output_base(profiles), timestamp)
+        os.makedirs(output_dir, exist_ok=True)
+        completed = None
     
     print(f"Screenshots will be saved to: {os.path.abspath(output_dir)}")
     
@@ -374,35 +591,144 @@ def process_websites(input_file):
     
     print(f"Detected Chrome version: {chrome_version}")
     
-    # Download matching ChromeDriver
-    chromedriver_path = download_chromedriver(chrome_version)
-    if not chromedriver_path:
-        print("Error: Failed to download or locate ChromeDriver. Cannot continue.")
-        return
-    
-    print(f"Using ChromeDriver at: {chromedriver_path}")
+    # The CDP engine talks to Chrome directly and needs no ChromeDriver
+    chromedriver_path = None
+    if engine == "selenium":
+        # Download matching ChromeDriver
+        chromedriver_path = download_chromedriver(chrome_version)
+        if not chromedriver_path:
+            print("Error: Failed to download or locate ChromeDriver. Cannot continue.")
+            return
+        
+        print(f"Using ChromeDriver at: {chromedriver_path}")
     
     try:
-        # Read URLs from the input file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f.readlines() if line.strip()]
+        # URLs are read lazily and de-duplicated while the workers are already capturing
+        with UrlSource(input_file) as source:
+            print("Viewport profiles: " + ", ".join(profile["name"] for profile in profiles))
+            print("Output formats: " + ", ".join(writer.outputs))
+            if blocker:
+                print(f"Blocking requests: {blocker.summary()}")
+            if browser_cache:
+                print(f"Browser cache: {browser_cache.root}")
+            if max_per_host:
+                print(f"At most {max_per_host} concurrent captures per domain")
+            if history:
+                print(f"Adaptive timeouts from: {history.path}")
+            if preflight:
+                print(f"Checking that hosts are reachable (timeout {preflight.timeout:g}s)")
+            skipped = 0
+            
+            def pending_urls():
+                nonlocal skipped
+                for url in source:
+                    if completed and url in completed:
+                        skipped += 1
+                        continue
+                    yield url
+            
+            # Leaving the block also waits for screenshots still being encoded and
+            # saves the timing history, also when the run is interrupted
+            with RunJournal(output_dir) as journal, writer, history or nullcontext():
+                def finished(url, success, record):
+                    if history:
+                        history.record(url, record)
+                    if retries:
+                        attempt = retries.attempt(url)
+                        if attempt > 1:
+                            record["attempt"] = attempt
+                        if not success and retries.add(url, record):
+                            record["will_retry"] = True
+                    journal.record(url, success, record)
+                
+                def capture(urls):
+                    if preflight:
+                        # Checked again on every retry pass, as a host that timed out may be back
+                        urls = preflight.live_urls(urls, lambda url, reason: finished(
+                            url, False, {"error": reason, "preflight": True}))
+                    if engine == "cdp":
+                        # Imported here so the selenium engine works without websockets installed
+                        from cdp_engine import run_cdp_capture
+                        
+                        # Same Chrome flags (headless, window size...) as the selenium engine; the
+                        # cache slot is chosen per Chrome, as a recycled one overlaps with the next
+                        chrome_args = build_chrome_options(chrome_path, profiles).arguments
+                        return run_cdp_capture(urls, output_dir, chrome_path, chrome_args, tabs=tabs,
+                                               page_load_timeout=profiles_page_load_timeout(profiles),
+                                               wait=wait, profiles=profiles,
+                                               on_result=finished, writer=writer, blocker=blocker,
+                                               max_per_host=max_per_host, history=history,
+                                               recycle_after=recycle_after, browser_cache=browser_cache)
+                    
+                    # Process each URL, one browser per worker
+                    def new_session():
+                        # Each worker keeps its own cache directory, also across browser restarts
+                        cache_args = browser_cache.chrome_args(browser_cache.acquire()) if browser_cache else ()
+                        return BrowserSession(chromedriver_path,
+                                              lambda: build_chrome_options(chrome_path, profiles, blocker, cache_args),
+                                              max_uses=recycle_after,
+                                              page_load_timeout=profiles_page_load_timeout(profiles),
+                                              on_start=lambda driver: blocker.apply(driver.execute_cdp_cmd)
+                                              if blocker else None)
+                    
+                    return run_capture_pool(
+                        urls,
+                        lambda url, session, record: take_screenshot(url, output_dir, chromedriver_path, chrome_path,
+                                                                     session=session, wait=wait, profiles=profiles,
+                                                                     record=record, writer=writer,
+                                                                     blocker=blocker, history=history),
+                        new_session,
+                        workers=workers,
+                        on_result=finished,
+                        max_per_host=max_per_host
+                    )
+                
+                if engine == "cdp":
+                    print(f"Using DevTools engine with {tabs} concurrent tabs")
+                elif workers > 1:
+                    print(f"Using {workers} parallel workers")
+                
+                stats = capture(pending_urls())
+                
+                # Capture transient failures again once the main pass is done
+                retry_pass = retries.next_pass() if retries else None
+                while retry_pass:
+                    delay, retry_urls = retry_pass
+                    print(f"\nRetrying {len(retry_urls)} URLs that failed with a transient error in {delay:g}s "
+                          f"(retry pass {retries.passes})")
+                    time.sleep(delay)
+                    retry_stats = capture(retry_urls)
+                    stats.successful += retry_stats.successful
+                    stats.failed += retry_stats.failed
+                    retry_pass = retries.next_pass()
         
-        if not urls:
+        if source.count == 0:
             print("No valid URLs found in the file.")
             return
         
-        print(f"Found {len(urls)} URLs to process")
+        print(f"Read {source.count} URLs ({source.duplicates} duplicates skipped)")
+        if skipped:
+            print(f"Skipped {skipped} URLs captured in the earlier run")
         
-        # Process each URL
-        successful = 0
-        failed = 0
+        # Counted per URL, by the last check of those checked again on a retry pass
+        unreachable = preflight.unreachable if preflight else 0
+        if unreachable:
+            print(f"{unreachable} of {preflight.checked} URLs were unreachable and not sent to a browser")
+        retried = retries.queued if retries else 0
+        if retried:
+            print(f"{retried} captures were retried after a transient error")
         
-        for url in urls:
-            if take_screenshot(url, output_dir, chromedriver_path, chrome_path):
-                successful += 1
-            else:
-                failed += 1
+        # URLs skipped on resume were captured by the earlier run; failures
+        # that were retried only count by the outcome of their last attempt
+        successful = skipped + stats.successful
+        failed = stats.failed + (preflight.rejected if preflight else 0) - retried
             
+        # Stage percentiles from the timings this run stored in the journal; a
+        # retried URL adds a sample per attempt
+        timing_report = TimingReport()
+        for entry in iter_entries(output_dir, journal.start):
+            timing_report.add(entry.get("timings"))
+        
         print("\nFinished processing all URLs")
         print(f"Results: {successful} successful, {failed} failed")
         print(f"Screenshots saved in: {os.path.abspath(output_dir)}")
@@ -411,12 +737,22 @@ def process_websites(input_file):
         summary_path = os.path.join(output_dir, "summary.txt")
         with open(summary_path, "w", encoding='utf-8') as summary_file:
             summary_file.write(f"Screenshot Run on {timestamp}\n")
-            summary_file.write(f"Total URLs: {len(urls)}\n")
+            summary_file.write("Profiles: " + ", ".join(
+                f"{p['name']} ({p['width']}x{p['height'] or 'full'})" for p in profiles) + "\n")
+            summary_file.write(f"Total URLs: {source.count}\n")
+            summary_file.write(f"Duplicates skipped: {source.duplicates}\n")
             summary_file.write(f"Successful: {successful}\n")
-            summary_file.write(f"Failed: {failed}\n\n")
+            summary_file.write(f"Failed: {failed}\n")
+            summary_file.write(f"Unreachable (preflight): {unreachable}\n")
+            summary_file.write(f"Retries: {retried}\n\n")
+            timing_lines = timing_report.summary_lines()
+            if timing_lines:
+                summary_file.write("Stage timings:\n")
+                summary_file.write("\n".join(timing_lines) + "\n\n")
             summary_file.write("URLs processed:\n")
-            for url in urls:
-                summary_file.write(f"- {url}\n")
+            # Streamed from the journal so the URL list is never held in memory
+            for entry in iter_final_entries(output_dir):
+                summary_file.write(f"- {entry['url']} ({entry['status']})\n")
         
         print(f"Summary saved to: {summary_path}")
         
@@ -426,14 +762,126 @@ def process_websites(input_file):
         print(f"Error processing websites: {e}")
         print(traceback.format_exc())
 
-if __name__ == "__main__":
-    # Check if input file is provided
-    if len(sys.argv) < 2:
-        print("Usage: python website_screenshot.py <input-file.txt>")
+def parse_args(argv=None, default_profiles="square"):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Take screenshots of every website in a URL list.")
+    parser.add_argument("input_file",
+                        help="text file with one URL per line, optionally gzip-compressed (.gz), or - for stdin")
+    parser.add_argument("--profiles", default=default_profiles,
+                        help="comma-separated viewport profiles captured from one page load: "
+                             f"{', '.join(VIEWPORT_PROFILES)} or WIDTHxHEIGHT (default: {default_profiles})")
+    parser.add_argument("--resume", metavar="RUN_DIR",
+                        help="continue an interrupted run in RUN_DIR, skipping URLs it already captured")
+    parser.add_argument("--max-capture-pixels", type=int, default=DEFAULT_MAX_PIXELS,
+                        help="full-page screenshots larger than this are captured in tiles and stitched "
+                             f"(default: {DEFAULT_MAX_PIXELS})")
+    parser.add_argument("--outputs", default="png",
+                        help="comma-separated formats written for each screenshot straight from memory: "
+                             "png (full size), resized (resized/*.png), webp (webp/*.webp) (default: png)")
+    parser.add_argument("--resize-width", type=int, default=800,
+                        help="width of the resized and webp outputs (default: 800)")
+    parser.add_argument("--image-workers", type=int, default=0,
+                        help="encode the resized and webp outputs in this many background processes while "
+                             "capturing continues (0 = encode in the capture worker, default: 0)")
+    parser.add_argument("--duplicate-finals", choices=DUPLICATE_MODES, default="keep",
+                        help="final screenshots that match the initial ones: keep them, drop them, or link "
+                             "them to the initial files (default: keep)")
+    parser.add_argument("--hash-threshold", type=int, default=0,
+                        help="max differing bits (of 256) in the perceptual hash for a final screenshot to "
+                             "count as a duplicate (default: 0)")
+    parser.add_argument("--blob-store", metavar="DIR",
+                        help="store every image once in this content-addressed folder, shared by all runs, "
+                             "and hard-link it into the run folder")
+    parser.add_argument("--block", default="",
+                        help="comma-separated URL patterns to block, * is a wildcard (e.g. *doubleclick.net*)")
+    parser.add_argument("--block-list", metavar="FILE",
+                        help="file with URL patterns to block, one per line (e.g. blocklist.txt)")
+    parser.add_argument("--block-types", default="",
+                        help="comma-separated resource types to block: media, font, websocket, beacon")
+    parser.add_argument("--browser-cache", metavar="DIR",
+                        help="keep the browsers' HTTP cache in DIR between URLs and runs (one slot per worker, two for cdp)")
+    parser.add_argument("--browser-cache-size", type=int, default=DEFAULT_CACHE_SIZE_MB,
+                        help=f"total size limit of --browser-cache in MB (default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument("--recycle-after", type=int, default=50,
+                        help="restart Chrome after this many URLs, also with --engine cdp "
+                             "(0 = never, default: 50)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of browsers capturing in parallel (default: 1)")
+    parser.add_argument("--engine", choices=["selenium", "cdp"], default="selenium",
+                        help="selenium: one ChromeDriver per worker; cdp: many tabs in one Chrome over DevTools")
+    parser.add_argument("--max-per-host", type=int, default=DEFAULT_MAX_PER_HOST,
+                        help="most URLs of one domain captured at the same time; domains are interleaved and "
+                             f"kept on the same browser (0 = keep list order, default: {DEFAULT_MAX_PER_HOST})")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="send every URL to the browser without first checking that its host is reachable "
+                             "(use this behind a proxy)")
+    parser.add_argument("--preflight-timeout", type=float, default=DEFAULT_PREFLIGHT_TIMEOUT,
+                        help="seconds for the DNS lookup and for the connection in the reachability check "
+                             f"(default: {DEFAULT_PREFLIGHT_TIMEOUT:g})")
+    parser.add_argument("--timing-history", metavar="FILE",
+                        help="file with the page load and settle times per domain used to size each URL's "
+                             f"timeouts (default: {HISTORY_FILE} in the screenshots folder)")
+    parser.add_argument("--no-adaptive-timeouts", action="store_true",
+                        help=f"use the same page load timeout ({PAGE_LOAD_TIMEOUT} s, {FULL_PAGE_LOAD_TIMEOUT} s "
+                             "with the full profile) and --max-wait for every URL")
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="times a URL that failed with a transient error (timeout, dropped connection, "
+                             f"browser crash) is captured again after the main pass (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--retry-backoff", type=float, default=DEFAULT_BACKOFF,
+                        help="seconds to wait before the first retry pass, doubled for each further pass "
+                             f"(default: {DEFAULT_BACKOFF:g})")
+    parser.add_argument("--tabs", type=int, default=8,
+                        help="concurrent tabs for the cdp engine (default: 8)")
+    parser.add_argument("--wait", choices=["ready", "fixed"], default="ready",
+                        help="ready: stop waiting once the page has settled; fixed: always wait 10+3+2 seconds")
+    parser.add_argument("--max-wait", type=float, default=15.0,
+                        help="maximum seconds to wait for a page to settle (default: 15)")
+    parser.add_argument("--network-idle", type=int, default=500,
+                        help="milliseconds without requests in flight before the network counts as idle (default: 500)")
+    parser.add_argument("--dom-quiet", type=int, default=500,
+                        help="milliseconds without DOM changes before the page counts as stable (default: 500)")
+    return parser.parse_args(argv)
+
+def main(default_profiles="square"):
+    """Command line entry point, also used by the per-format wrapper scripts."""
+    args = parse_args(default_profiles=default_profiles)
+    try:
+        profiles = resolve_profiles(args.profiles, args.max_capture_pixels)
+        outputs = parse_outputs(args.outputs)
+        patterns = [pattern.strip() for pattern in args.block.split(",") if pattern.strip()]
+        if args.block_list:
+            patterns += load_patterns(args.block_list)
+        blocker = RequestBlocker(patterns, parse_resource_types(args.block_types))
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    process_websites(input_file)
+    blob_store = BlobStore(args.blob_store) if args.blob_store else None
+    history = None
+    if not args.no_adaptive_timeouts:
+        history = TimingHistory(args.timing_history or os.path.join(profiles_output_base(profiles), HISTORY_FILE),
+                                page_load_timeout=profiles_page_load_timeout(profiles), max_wait=args.max_wait)
+    if args.image_workers > 0:
+        writer = ImagePipeline(outputs, args.resize_width, args.duplicate_finals, args.hash_threshold, blob_store,
+                               workers=args.image_workers)
+    else:
+        writer = ImageWriter(outputs, args.resize_width, args.duplicate_finals, args.hash_threshold, blob_store)
+    
+    process_websites(args.input_file, recycle_after=args.recycle_after, workers=args.workers,
+                     engine=args.engine, tabs=args.tabs,
+                     wait=PageWait(args.wait, args.max_wait, args.network_idle, args.dom_quiet),
+                     profiles=profiles, resume_dir=args.resume, writer=writer,
+                     blocker=blocker if blocker.enabled else None, max_per_host=args.max_per_host,
+                     preflight=None if args.no_preflight else Preflight(args.preflight_timeout),
+                     history=history,
+                     retries=RetryQueue(args.retries, args.retry_backoff) if args.retries > 0 else None,
+                     browser_cache=BrowserCache(args.browser_cache, args.browser_cache_size,
+                                                slots=2 if args.engine == "cdp" else args.workers)
+                     if args.browser_cache else None)
     
     # Keep console window open if run from batch file
-    input("\nPress Enter to exit...")
\ No newline at end of file
+    if args.input_file != "-":
+        input("\nPress Enter to exit...")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file